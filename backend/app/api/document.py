@@ -7,6 +7,7 @@ from app.models.document import Document as DocModel, DocumentStatus
 from app.models.knowledge_base import KnowledgeBase as KBModel
 from app.schemas import Document
 from app.services.ingestion import ingestion_service
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -88,9 +89,8 @@ async def delete_document(kb_id: str, doc_id: str, db: AsyncSession = Depends(ge
     
     # Delete from Milvus
     try:
-        from app.core.milvus import create_collection
-        collection = create_collection(kb_id)
-        collection.load()
+        from app.core.milvus import get_collection
+        collection = get_collection(kb_id)
         expr = f'doc_id == "{doc_id}"'
         collection.delete(expr)
         collection.flush()
@@ -98,11 +98,18 @@ async def delete_document(kb_id: str, doc_id: str, db: AsyncSession = Depends(ge
     except Exception as e:
         print(f"Failed to delete chunks from Milvus for doc {doc_id}: {e}")
 
+    # Delete from BM25 inverted index
+    try:
+        from app.services.retrieval.bm25_index import inverted_index_manager
+        await asyncio.to_thread(inverted_index_manager.remove_document, kb_id, doc_id)
+    except Exception as e:
+        print(f"Failed to delete chunks from BM25 index for doc {doc_id}: {e}")
+
     return {"ok": True}
 
 @router.get("/{kb_id}/documents/{doc_id}/chunks")
 async def get_document_chunks(kb_id: str, doc_id: str, db: AsyncSession = Depends(get_db)):
-    from app.core.milvus import create_collection
+    from app.core.milvus import get_collection
     from pymilvus import Collection
     
     # Verify document exists
@@ -112,8 +119,7 @@ async def get_document_chunks(kb_id: str, doc_id: str, db: AsyncSession = Depend
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Query Milvus for chunks
-    collection = create_collection(kb_id)
-    collection.load()
+    collection = get_collection(kb_id)
     
     # Query by doc_id
     expr = f'doc_id == "{doc_id}"'
@@ -151,7 +157,7 @@ async def update_chunk(
 ):
     """Update chunk content and re-generate embedding"""
     try:
-        from app.core.milvus import create_collection
+        from app.core.milvus import get_collection, normalize_vectors
         from app.services.embedding import embedding_service
         from datetime import datetime
         
@@ -161,9 +167,14 @@ async def update_chunk(
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
+        # Embedding provider of the KB
+        from app.services.embedding_providers import EmbeddingProviderFactory
+        kb_result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
+        kb = kb_result.scalars().first()
+        embedding_provider = EmbeddingProviderFactory.for_kb(kb)
+        
         # Get collection
-        collection = create_collection(kb_id)
-        collection.load()
+        collection = get_collection(kb_id)
         
         # Verify chunk exists
         expr = f'chunk_id == "{chunk_id}"'
@@ -189,8 +200,10 @@ async def update_chunk(
         existing_metadata = existing_chunks[0].get('metadata', {}) if len(existing_chunks) > 0 else {}
         
         # Generate new embedding
-        embeddings = await embedding_service.get_embeddings([content])
+        embeddings = await embedding_service.get_embeddings([content], provider=embedding_provider)
         new_embedding = embeddings[0]
+        if kb and kb.metric_type and kb.metric_type != "COSINE":
+            new_embedding = normalize_vectors([new_embedding])[0]
         
         # Delete old chunk
         collection.delete(expr)
@@ -208,6 +221,10 @@ async def update_chunk(
         collection.insert(entities)
         collection.flush()
         
+        # Update BM25 inverted index
+        from app.services.retrieval.bm25_index import inverted_index_manager
+        await asyncio.to_thread(inverted_index_manager.update_chunk, kb_id, doc_id, chunk_id, content)
+        
         # Update Graph RAG if enabled
         kb_result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
         kb = kb_result.scalars().first()
@@ -221,7 +238,7 @@ async def update_chunk(
                 
                  # Ensure dataset exists
                 try:
-                    fuseki_client.create_dataset(kb_id)
+                    await fuseki_client.create_dataset(kb_id)
                 except Exception as e:
                     logger.warning(f"Could not create/verify dataset: {e}")
                 
@@ -241,7 +258,7 @@ async def update_chunk(
                 }}
                 """
                 
-                fuseki_client.update(kb_id, delete_query)
+                await fuseki_client.update(kb_id, delete_query)
                 logger.info(f"Deleted old graph triples for chunk {chunk_id}")
                 
                 # Extract new entities and relationships
@@ -250,7 +267,7 @@ async def update_chunk(
                 
                 if new_triples:
                     # Insert new triples
-                    fuseki_client.insert_triples(kb_id, new_triples)
+                    await fuseki_client.insert_triples(kb_id, new_triples)
                     logger.info(f"Inserted {len(new_triples)} new graph triples for chunk {chunk_id}")
                 else:
                     logger.warning(f"No graph elements extracted from updated chunk {chunk_id}")
@@ -260,6 +277,9 @@ async def update_chunk(
                 logger.error(f"Error updating graph for chunk {chunk_id}: {graph_error}")
                 import traceback
                 traceback.print_exc()
+            finally:
+                from app.services.llm_cache import llm_cache
+                llm_cache.invalidate_kb(kb_id)
         
         # Update document's updated_at timestamp
         doc.updated_at = datetime.utcnow()
@@ -39,13 +39,17 @@ async def expand_graph(
     if backend == "neo4j":
         # Neo4j Query
         query = """
+        CALL {
+            MATCH (n:Entity {kb_id: $kb_id, name: $entity}) RETURN n
+            UNION
+            MATCH (n:Entity {kb_id: $kb_id, label_ko: $entity}) RETURN n
+        }
         MATCH (n)-[r]-(m)
-        WHERE n.label_ko = $entity OR n.name = $entity 
         RETURN n, r, m, type(r) as rel_type
         LIMIT 50
         """
         try:
-            records = neo4j_client.execute_query(query, {"entity": entity})
+            records = await neo4j_client.execute_query(query, {"entity": entity, "kb_id": kb_id})
             
             for record in records:
                 n = record["n"]
@@ -124,7 +128,7 @@ async def expand_graph(
         LIMIT 50
         """
         try:
-            results = fuseki_client.query_sparql(kb_id, sparql)
+            results = await fuseki_client.query_sparql(kb_id, sparql)
             bindings = results.get("results", {}).get("bindings", [])
             
             for b in bindings:
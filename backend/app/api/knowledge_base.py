@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks
 from dataclasses import asdict
 from pymilvus import Collection
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,19 +6,25 @@ from sqlalchemy.future import select
 from typing import List
 from app.core.database import get_db
 from app.models.knowledge_base import KnowledgeBase as KBModel
-from app.schemas import KnowledgeBaseCreate, KnowledgeBase
-from app.core.milvus import create_collection, utility, connect_milvus
+from app.schemas import KnowledgeBaseCreate, KnowledgeBase, IndexRebuildRequest
+from app.core.milvus import (
+    get_collection, collection_registry, collection_name_for, utility, connect_milvus,
+    recommend_index, resolve_index_config, validate_index_params, rebuild_index, LEGACY_INDEX_TYPE
+)
 from app.models.document import Document as DocModel
 from sqlalchemy import delete
 
+import asyncio
 import yaml
 import os
 from pathlib import Path
 from app.core.config import settings
-import requests
+from app.core.http_client import get_http_client
 import json
 
 from app.core.fuseki import fuseki_client
+from app.services.embedding_providers import EmbeddingProviderFactory
+from app.services.retrieval import reranking_service
 
 router = APIRouter()
 
@@ -28,6 +34,28 @@ async def create_knowledge_base(kb: KnowledgeBaseCreate, db: AsyncSession = Depe
     enable_graph = kb.enable_graph_rag
     if kb.graph_backend and kb.graph_backend != 'none':
         enable_graph = True
+
+    # Embedding provider is fixed per KB (vectors of different models are not comparable)
+    provider_name = (kb.embedding_provider or EmbeddingProviderFactory.default_provider_name()).lower()
+    try:
+        embedding_provider = EmbeddingProviderFactory.get_provider(provider_name, kb.embedding_model)
+        # The local provider loads its model to report the dimension; keep that off the event loop
+        dim = await asyncio.to_thread(lambda: embedding_provider.dimension)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid embedding provider: {e}")
+
+    # ANN index: explicit type, or the recommendation for a new (empty) collection
+    if kb.index_type:
+        index_type, index_params, search_params = kb.index_type, kb.index_params, kb.search_params
+    else:
+        index_type, index_params, search_params = recommend_index(0, dim)
+        index_params = {**index_params, **(kb.index_params or {})}
+        search_params = {**search_params, **(kb.search_params or {})}
+    try:
+        index_type, index_params, search_params = resolve_index_config(index_type, index_params, search_params, dim=dim)
+        validate_index_params(index_type, index_params, dim=dim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     db_kb = KBModel(
         name=kb.name, 
@@ -36,7 +64,12 @@ async def create_knowledge_base(kb: KnowledgeBaseCreate, db: AsyncSession = Depe
         chunking_config=kb.chunking_config,
         metric_type='COSINE',  # Always use COSINE
         enable_graph_rag=enable_graph,
-        graph_backend=kb.graph_backend
+        graph_backend=kb.graph_backend,
+        embedding_provider=provider_name,
+        embedding_model=kb.embedding_model,
+        index_type=index_type,
+        index_params=index_params,
+        search_params=search_params
     )
     db.add(db_kb)
     await db.commit()
@@ -44,14 +77,17 @@ async def create_knowledge_base(kb: KnowledgeBaseCreate, db: AsyncSession = Depe
     
     # Create Milvus collection
     try:
-        create_collection(db_kb.id, metric_type=db_kb.metric_type)
+        get_collection(
+            db_kb.id, load=False, metric_type=db_kb.metric_type, dim=dim,
+            index_type=index_type, index_params=index_params
+        )
     except Exception as e:
         print(f"Failed to create Milvus collection: {e}")
 
     # Create Fuseki dataset if Graph RAG is enabled
     if db_kb.enable_graph_rag:
         try:
-            fuseki_client.create_dataset(db_kb.id)
+            await fuseki_client.create_dataset(db_kb.id)
         except Exception as e:
             print(f"Failed to create Fuseki dataset: {e}")
         
@@ -92,6 +128,11 @@ async def list_knowledge_bases(skip: int = 0, limit: int = 100, db: AsyncSession
             "metric_type": kb.metric_type,
             "enable_graph_rag": kb.enable_graph_rag,
             "graph_backend": kb.graph_backend,
+            "embedding_provider": kb.embedding_provider,
+            "embedding_model": kb.embedding_model,
+            "index_type": kb.index_type,
+            "index_params": kb.index_params,
+            "search_params": kb.search_params,
             "is_promoted": kb.is_promoted,
             "promotion_metadata": kb.promotion_metadata,
             "document_count": row[1],
@@ -143,6 +184,133 @@ async def promote_knowledge_base(
     await db.refresh(kb)
     return {"id": kb.id, "is_promoted": kb.is_promoted, "promotion_metadata": kb.promotion_metadata}
 
+# kb_id -> status of the latest background index rebuild
+index_rebuilds = {}
+
+def _collection_stats(kb_id: str) -> dict:
+    collection = get_collection(kb_id, load=False)
+    dim = next((f.params.get("dim") for f in collection.schema.fields if f.name == "vector"), None)
+    current = collection.indexes[0].params if collection.indexes else {}
+    return {"num_entities": collection.num_entities, "dim": dim, "milvus_index": current}
+
+@router.get("/{kb_id}/index")
+async def get_index_info(kb_id: str, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
+    kb = result.scalars().first()
+    if kb is None:
+        raise HTTPException(status_code=404, detail="Knowledge Base not found")
+
+    try:
+        stats = await asyncio.to_thread(_collection_stats, kb_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read Milvus collection: {e}")
+
+    recommended_type, recommended_build, recommended_search = recommend_index(stats["num_entities"], stats["dim"] or 1536)
+    return {
+        "index_type": kb.index_type or LEGACY_INDEX_TYPE,
+        "index_params": kb.index_params or {},
+        "search_params": kb.search_params or {},
+        **stats,
+        "recommended": {
+            "index_type": recommended_type,
+            "index_params": recommended_build,
+            "search_params": recommended_search
+        },
+        "rebuild": index_rebuilds.get(kb_id)
+    }
+
+@router.get("/reranker/stats")
+async def get_reranker_stats():
+    # Process-wide (shared by all KBs): micro-batch sizes and score-cache hit rates
+    return reranking_service.stats()
+
+async def _rebuild_index_task(
+    kb_id: str,
+    metric_type: str,
+    index_type: str,
+    index_params: dict,
+    search_params: dict,
+    previous_index_type: str = None,
+    previous_index_params: dict = None
+):
+    from app.core.database import SessionLocal
+    from datetime import datetime
+
+    index_rebuilds[kb_id] = {"status": "running", "index_type": index_type, "started_at": datetime.now().isoformat()}
+    try:
+        await asyncio.to_thread(
+            rebuild_index, kb_id, metric_type, index_type, index_params,
+            previous_index_type, previous_index_params
+        )
+    except Exception as e:
+        print(f"Index rebuild failed for KB {kb_id}: {e}")
+        index_rebuilds[kb_id].update({"status": "failed", "error": str(e)})
+        return
+
+    async with SessionLocal() as db:
+        result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
+        kb = result.scalars().first()
+        if kb:
+            kb.index_type = index_type
+            kb.index_params = index_params
+            kb.search_params = search_params
+            await db.commit()
+
+    index_rebuilds[kb_id].update({"status": "completed", "finished_at": datetime.now().isoformat()})
+    print(f"Rebuilt {index_type} index for KB {kb_id}")
+
+@router.post("/{kb_id}/index/rebuild")
+async def rebuild_knowledge_base_index(
+    kb_id: str,
+    background_tasks: BackgroundTasks,
+    request: IndexRebuildRequest = Body(default=IndexRebuildRequest()),
+    db: AsyncSession = Depends(get_db)
+):
+    """Rebuild the vector index in the background without dropping the collection."""
+    result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
+    kb = result.scalars().first()
+    if kb is None:
+        raise HTTPException(status_code=404, detail="Knowledge Base not found")
+    if (index_rebuilds.get(kb_id) or {}).get("status") in ("pending", "running"):
+        raise HTTPException(status_code=409, detail="Index rebuild already in progress")
+
+    try:
+        stats = await asyncio.to_thread(_collection_stats, kb_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read Milvus collection: {e}")
+    dim = stats["dim"] or 1536
+
+    if request.index_type:
+        index_type, index_params, search_params = request.index_type, request.index_params, request.search_params
+    else:
+        index_type, index_params, search_params = recommend_index(stats["num_entities"], dim)
+        index_params = {**index_params, **(request.index_params or {})}
+        search_params = {**search_params, **(request.search_params or {})}
+    try:
+        index_type, index_params, search_params = resolve_index_config(index_type, index_params, search_params, dim=dim)
+        validate_index_params(index_type, index_params, dim=dim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    index_rebuilds[kb_id] = {"status": "pending", "index_type": index_type}
+    background_tasks.add_task(
+        _rebuild_index_task,
+        kb_id,
+        kb.metric_type or "COSINE",
+        index_type,
+        index_params,
+        search_params,
+        kb.index_type or LEGACY_INDEX_TYPE,
+        kb.index_params
+    )
+    return {
+        "status": "started",
+        "index_type": index_type,
+        "index_params": index_params,
+        "search_params": search_params,
+        "num_entities": stats["num_entities"]
+    }
+
 @router.delete("/{kb_id}")
 async def delete_knowledge_base(kb_id: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(KBModel).filter(KBModel.id == kb_id))
@@ -157,9 +325,10 @@ async def delete_knowledge_base(kb_id: str, db: AsyncSession = Depends(get_db)):
     await db.commit()
     
     # Drop Milvus collection
+    collection_registry.invalidate(kb_id)
     try:
         connect_milvus()
-        collection_name = f"kb_{kb_id.replace('-', '_')}"
+        collection_name = collection_name_for(kb_id)
         try:
             if utility.has_collection(collection_name):
                 col = Collection(collection_name)
@@ -170,11 +339,32 @@ async def delete_knowledge_base(kb_id: str, db: AsyncSession = Depends(get_db)):
     except Exception as e:
         print(f"Error during Milvus cleanup: {e}")
 
+    # Delete BM25 inverted index
+    try:
+        from app.services.retrieval.bm25_index import inverted_index_manager
+        inverted_index_manager.drop(kb_id)
+    except Exception as e:
+        print(f"Error deleting BM25 index: {e}")
+
     # Delete Fuseki dataset
     try:
-        fuseki_client.delete_dataset(kb_id)
+        await fuseki_client.delete_dataset(kb_id)
     except Exception as e:
         print(f"Error deleting Fuseki dataset: {e}")
+
+    # Drop cached Cypher/SPARQL generations
+    try:
+        from app.services.llm_cache import llm_cache
+        llm_cache.invalidate_kb(kb_id)
+    except Exception as e:
+        print(f"Error invalidating LLM cache: {e}")
+
+    # Drop the cached spaCy processor (query-time gazetteer)
+    try:
+        from app.services.ingestion.spacy_processor import drop_processor
+        drop_processor(kb_id)
+    except Exception as e:
+        print(f"Error dropping spaCy processor: {e}")
         
     return {"ok": True}
 
@@ -231,7 +421,7 @@ If everything is perfect, respond with "OK".
             "temperature": 0
         }
         
-        response = requests.post(
+        response = await get_http_client("llm").post(
             "https://api.openai.com/v1/chat/completions",
             headers=headers,
             json=payload,
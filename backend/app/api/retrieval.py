@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.schemas import RetrievalRequest, RetrievalResult
 from app.services.retrieval import retrieval_factory, reranking_service
+from app.services.embedding_providers import EmbeddingProviderFactory
+from app.services.retrieval.context import RetrievalContext
+from app.core.milvus import resolve_index_config, LEGACY_INDEX_TYPE
 from app.core.database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -68,6 +71,16 @@ async def retrieve_chunks(
         raise HTTPException(status_code=404, detail="Knowledge Base not found")
         
     metric_type = kb.metric_type or "COSINE"
+    embedding_provider = EmbeddingProviderFactory.for_kb(kb)
+    _, _, ann_params = resolve_index_config(kb.index_type or LEGACY_INDEX_TYPE, kb.index_params, kb.search_params)
+    # Shared by every strategy this request runs (embeddings, tokens, fetched chunks, timings)
+    context = RetrievalContext(
+        kb_id=kb_id,
+        kb=kb,
+        metric_type=metric_type,
+        embedding_provider=embedding_provider,
+        ann_search_params=ann_params
+    )
 
     # 1. Selection & Retrieval
     strategy = retrieval_factory.get_strategy(request.strategy)
@@ -87,8 +100,10 @@ async def retrieve_chunks(
         # Graph specific
         enable_inverse_search=request.enable_inverse_search,
         inverse_extraction_mode=request.inverse_extraction_mode,
-        use_relation_filter=request.use_relation_filter
+        use_relation_filter=request.use_relation_filter,
+        context=context
     )
+    print(f"[DEBUG] Retrieval timings: {context.timing_summary()}")
     
     # 2. Reranking (Cross-Encoder)
     # Different logic for 2-stage as it's built-in, but separate reranker can still apply if requested explicitly
@@ -109,7 +124,9 @@ async def retrieve_chunks(
                 query=request.query,
                 results=results,
                 top_k=request.reranker_top_k,
-                threshold=request.reranker_threshold
+                threshold=request.reranker_threshold,
+                embedding_provider=embedding_provider,
+                context=context
             )
 
     # 3. NER Filtering
@@ -120,25 +137,25 @@ async def retrieve_chunks(
         
     # 3.5. Flat Index (L2) Re-ranking (Exact L2 Distance on Candidates)
     if request.use_brute_force and results:
-        from app.services.embedding import embedding_service
         import numpy as np
         
         print(f"[DEBUG] Applying Flat Index L2 Re-ranking (Top K: {request.brute_force_top_k}, Threshold (Max Dist): {request.brute_force_threshold})")
         
         # 1. Embed query
-        query_embedding = (await embedding_service.get_embeddings([request.query]))[0]
+        query_embedding = await context.get_query_embedding(request.query)
         
-        # 2. Embed content of candidates
-        candidate_contents = [r['content'] for r in results]
-        candidate_embeddings = await embedding_service.get_embeddings(candidate_contents)
+        # 2. Stored vectors of candidates (one batched Milvus fetch, no re-embedding)
+        candidate_embeddings = await context.get_chunk_vectors(results)
         
-        # 3. Compute L2 Distance
+        # 3. Compute L2 Distance (all candidates at once)
+        distances = np.linalg.norm(
+            np.asarray(candidate_embeddings, dtype=np.float32) - np.asarray(query_embedding, dtype=np.float32),
+            axis=1
+        )
         reranked = []
-        for i, doc_embedding in enumerate(candidate_embeddings):
+        for i, dist in enumerate(distances):
             # L2 Metric
-            vec1 = np.array(query_embedding)
-            vec2 = np.array(doc_embedding)
-            dist = float(np.linalg.norm(vec1 - vec2))
+            dist = float(dist)
             
             # Apply threshold (LOWER is better for L2)
             if dist <= request.brute_force_threshold:
@@ -184,6 +201,16 @@ async def chat_with_kb(
         raise HTTPException(status_code=404, detail="Knowledge Base not found")
         
     metric_type = kb.metric_type or "COSINE"
+    embedding_provider = EmbeddingProviderFactory.for_kb(kb)
+    _, _, ann_params = resolve_index_config(kb.index_type or LEGACY_INDEX_TYPE, kb.index_params, kb.search_params)
+    # Shared by every strategy this request runs (embeddings, tokens, fetched chunks, timings)
+    context = RetrievalContext(
+        kb_id=kb_id,
+        kb=kb,
+        metric_type=metric_type,
+        embedding_provider=embedding_provider,
+        ann_search_params=ann_params
+    )
     
     # Auto-enable graph search if KB has Graph RAG enabled
     use_graph_search = request.enable_graph_search
@@ -209,8 +236,10 @@ async def chat_with_kb(
         use_relation_filter=request.use_relation_filter,
         enable_inverse_search=request.enable_inverse_search,
         inverse_extraction_mode=request.inverse_extraction_mode,
-        use_raw_log=request.use_raw_log
+        use_raw_log=request.use_raw_log,
+        context=context
     )
+    print(f"[DEBUG] Retrieval timings: {context.timing_summary()}")
     
     with open("backend_debug.log", "a") as f:
         f.write(f"Strategy: {request.strategy}, Initial Results: {len(results) if results else 0}\n")
@@ -230,7 +259,9 @@ async def chat_with_kb(
                 query=request.query,
                 results=results,
                 top_k=request.reranker_top_k,
-                threshold=request.reranker_threshold
+                threshold=request.reranker_threshold,
+                embedding_provider=embedding_provider,
+                context=context
             )
 
     if request.use_ner and results:
@@ -242,26 +273,26 @@ async def chat_with_kb(
         with open("backend_debug.log", "a") as f:
             f.write(f"Entering BF Block. Results: {len(results)}\n")
             
-        from app.services.embedding import embedding_service
         import numpy as np
         
         print(f"[DEBUG] Applying Flat Index L2 Re-ranking (Top K: {request.brute_force_top_k}, Threshold (Max Dist): {request.brute_force_threshold})")
         
         # 1. Embed query
-        query_embedding = (await embedding_service.get_embeddings([request.query]))[0]
+        query_embedding = await context.get_query_embedding(request.query)
         
-        # 2. Embed content of candidates
-        candidate_contents = [r['content'] for r in results]
-        candidate_embeddings = await embedding_service.get_embeddings(candidate_contents)
+        # 2. Stored vectors of candidates (one batched Milvus fetch, no re-embedding)
+        candidate_embeddings = await context.get_chunk_vectors(results)
         
-        # 3. Compute L2 Distance
+        # 3. Compute L2 Distance (all candidates at once)
+        distances = np.linalg.norm(
+            np.asarray(candidate_embeddings, dtype=np.float32) - np.asarray(query_embedding, dtype=np.float32),
+            axis=1
+        )
         reranked = []
         debug_dists = []
-        for i, doc_embedding in enumerate(candidate_embeddings):
+        for i, dist in enumerate(distances):
             # L2 Metric
-            vec1 = np.array(query_embedding)
-            vec2 = np.array(doc_embedding)
-            dist = float(np.linalg.norm(vec1 - vec2))
+            dist = float(dist)
             debug_dists.append(dist)
             
             print(f"[DEBUG] L2: {dist:.4f} vs Threshold: {request.brute_force_threshold:.4f} -> {'KEEP' if dist <= request.brute_force_threshold else 'DROP'}")
@@ -292,7 +323,7 @@ async def chat_with_kb(
         reranked.sort(key=lambda x: x['score'], reverse=True)
         results = reranked[:request.brute_force_top_k]
         
-        if not results and candidate_contents:
+        if not results and candidate_embeddings:
              debug_msg = f"BF Filtered All! Threshold: {request.brute_force_threshold}. Dists: {debug_dists}"
              with open("backend_debug.log", "a") as f:
                  f.write(f"BF Cut All: {debug_dists}\n")
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "RAG Management System"
@@ -18,11 +19,89 @@ class Settings(BaseSettings):
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 50
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 30.0  # seconds waiting for a pooled connection
+    NEO4J_CONNECTION_TIMEOUT: float = 10.0
+    NEO4J_MAX_CONNECTION_LIFETIME: int = 3600  # seconds
+    NEO4J_WRITE_BATCH_SIZE: int = 500  # rows per UNWIND write transaction
     
     
     # OpenAI
     OPENAI_API_KEY: str = ""
 
+    # Embedding
+    DEFAULT_EMBEDDING_PROVIDER: str = "openai"  # openai or local (per-KB override)
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100000  # Token budget per embeddings request
+    EMBEDDING_BATCH_MAX_INPUTS: int = 2048    # Provider limit on inputs per request
+    EMBEDDING_CONCURRENCY: int = 4            # Concurrent embedding requests
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # seconds
+
+    # Local (CPU) embedding provider
+    USE_LOCAL_MODEL: bool = False  # Make "local" the default provider (air-gapped deployments)
+    LOCAL_MODEL_PATH: str = "all-MiniLM-L6-v2"  # sentence-transformers model name or path
+    LOCAL_EMBEDDING_BACKEND: str = "torch"  # torch or onnx
+    LOCAL_EMBEDDING_QUANTIZE: str = "none"  # none or int8 (torch backend)
+    LOCAL_EMBEDDING_ONNX_FILE: Optional[str] = None  # e.g. onnx/model_qint8_avx2.onnx
+    LOCAL_EMBEDDING_BATCH_MAX_CHARS: int = 32000
+    LOCAL_EMBEDDING_BATCH_MAX_SIZE: int = 64
+
+    # Cross-encoder reranker (shared by the reranker and the 2-stage strategy)
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANKER_BACKEND: str = "torch"  # torch or onnx
+    RERANKER_QUANTIZE: str = "none"  # none or int8 (torch backend)
+    RERANKER_ONNX_FILE: Optional[str] = None  # e.g. onnx/model_qint8_avx2.onnx
+    RERANKER_BATCH_SIZE: int = 32
+    RERANKER_MAX_LENGTH: int = 512  # tokens per (query, passage) pair
+    RERANKER_WORKERS: int = 1  # inference threads; torch already uses all cores per call
+    RERANKER_PRELOAD: bool = True  # load + warm up the model at startup
+    # Micro-batching: pairs from concurrent requests are collected for up to
+    # MAX_WAIT_MS (or until MAX_PAIRS) and scored in one forward pass
+    RERANKER_MICROBATCH_ENABLED: bool = True
+    RERANKER_MICROBATCH_MAX_WAIT_MS: float = 5.0
+    RERANKER_MICROBATCH_MAX_PAIRS: int = 256
+    RERANKER_SCORE_CACHE_SIZE: int = 50000  # (query, chunk) scores kept in memory
+
+    # LLM reranker: "listwise" scores many chunks per prompt, "pointwise" one prompt per chunk
+    LLM_RERANK_MODE: str = "listwise"
+    LLM_RERANK_MODEL: str = "gpt-3.5-turbo"
+    LLM_RERANK_CONCURRENCY: int = 8  # concurrent rerank completions across all requests
+    LLM_RERANK_PROMPT_TOKENS: int = 12000  # passage token budget per listwise prompt
+    LLM_RERANK_CHUNK_MAX_TOKENS: int = 512
+    LLM_RERANK_CHUNK_MIN_TOKENS: int = 128  # below this share, passages are split over more prompts
+    LLM_RERANK_CACHE_SIZE: int = 20000  # (query, chunk) scores kept in memory
+
+    # Vector search scoring: "milvus" trusts the distance returned by the ANN search,
+    # "recompute" fetches stored vectors and recomputes cosine in Python
+    VECTOR_SCORE_MODE: str = "milvus"
+
+    # Hybrid parallel mode: per-branch timeouts (seconds). A branch that times out is
+    # left out of the RRF fusion instead of failing the request.
+    HYBRID_BM25_TIMEOUT: float = 5.0
+    HYBRID_ANN_TIMEOUT: float = 10.0
+    HYBRID_GRAPH_TIMEOUT: float = 20.0
+
+    # LLM response cache (graph query analysis, entity extraction, Cypher/SPARQL generation)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "data/llm_cache.db"
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    LLM_CACHE_TTL: int = 604800  # seconds (7 days)
+
+    # Pooled async HTTP clients (per upstream service: LLM API, Fuseki)
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    LLM_HTTP_TIMEOUT: float = 60.0
+    FUSEKI_HTTP_TIMEOUT: float = 30.0
+    FUSEKI_UPLOAD_TIMEOUT: float = 300.0  # bulk Graph Store Protocol uploads
+    FUSEKI_UPLOAD_GZIP: bool = True  # gzip-compress bulk upload bodies
+
     # Doc2Onto
     DOC2ONTO_CONFIG_PATH: str = "doc2onto_config.yaml"
     
@@ -1,31 +1,38 @@
-import requests
-from requests.auth import HTTPBasicAuth
-from SPARQLWrapper import SPARQLWrapper, JSON, POST
+import httpx
+import zlib
+from typing import Iterable, Optional, Union
 from app.core.config import settings
+from app.core.http_client import get_http_client
 import logging
 
 logger = logging.getLogger(__name__)
 
 class FusekiClient:
+    """Async Fuseki client (SPARQL protocol over the shared, pooled "fuseki" HTTP client)."""
+
     def __init__(self):
         self.base_url = settings.FUSEKI_URL
         # Default credentials for Fuseki (admin/admin)
-        self.auth = HTTPBasicAuth("admin", "admin")
-        
+        self.auth = httpx.BasicAuth("admin", "admin")
+
+    @property
+    def _http(self) -> httpx.AsyncClient:
+        return get_http_client("fuseki")
+
     def _get_dataset_url(self, kb_id: str) -> str:
         """Get the dataset URL for a specific knowledge base."""
         # Sanitize kb_id to be URL safe for Fuseki dataset name
         safe_name = f"kb_{kb_id.replace('-', '_')}"
         return f"{self.base_url}/{safe_name}"
 
-    def create_dataset(self, kb_id: str) -> bool:
+    async def create_dataset(self, kb_id: str) -> bool:
         """Create a new dataset in Fuseki for the knowledge base."""
         safe_name = f"kb_{kb_id.replace('-', '_')}"
-        
+
         # Check if dataset exists
         try:
             check_url = f"{self.base_url}/$/datasets/{safe_name}"
-            response = requests.get(check_url, auth=self.auth, timeout=5)
+            response = await self._http.get(check_url, auth=self.auth, timeout=5)
             if response.status_code == 200:
                 logger.info(f"Dataset {safe_name} already exists.")
                 return True
@@ -38,9 +45,9 @@ class FusekiClient:
             "dbName": safe_name,
             "dbType": "tdb2"
         }
-        
+
         try:
-            response = requests.post(create_url, data=payload, auth=self.auth, timeout=10)
+            response = await self._http.post(create_url, data=payload, auth=self.auth, timeout=10)
             if response.status_code == 200:
                 logger.info(f"Created Fuseki dataset: {safe_name}")
                 return True
@@ -51,13 +58,13 @@ class FusekiClient:
             logger.error(f"Error creating Fuseki dataset: {e}")
             return False
 
-    def delete_dataset(self, kb_id: str) -> bool:
+    async def delete_dataset(self, kb_id: str) -> bool:
         """Delete the dataset for the knowledge base."""
         safe_name = f"kb_{kb_id.replace('-', '_')}"
         delete_url = f"{self.base_url}/$/datasets/{safe_name}"
-        
+
         try:
-            response = requests.delete(delete_url, auth=self.auth, timeout=10)
+            response = await self._http.delete(delete_url, auth=self.auth, timeout=10)
             if response.status_code == 200:
                 logger.info(f"Deleted Fuseki dataset: {safe_name}")
                 return True
@@ -70,55 +77,102 @@ class FusekiClient:
             logger.error(f"Error deleting Fuseki dataset: {e}")
             return False
 
-    def insert_triples(self, kb_id: str, triples: list[str]) -> bool:
+    async def update(self, kb_id: str, sparql_update: str) -> bool:
+        """Execute a SPARQL UPDATE (INSERT/DELETE) on the dataset."""
+        update_url = f"{self._get_dataset_url(kb_id)}/update"
+        try:
+            response = await self._http.post(update_url, data={"update": sparql_update}, auth=self.auth)
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.error(f"Error executing SPARQL update on {kb_id}: {e}")
+            return False
+
+    async def insert_triples(self, kb_id: str, triples: list[str]) -> bool:
         """
-        Insert N-Triples formatted strings into the dataset.
+        Insert N-Triples formatted strings into the dataset (default graph).
         triples: List of strings like '<http://ex/s> <http://ex/p> <http://ex/o> .'
         """
         if not triples:
             return True
-            
-        dataset_url = self._get_dataset_url(kb_id)
-        update_url = f"{dataset_url}/update"
-        
-        # Construct SPARQL INSERT DATA query
-        # Breaking into chunks to avoid massive requests
-        chunk_size = 100
-        for i in range(0, len(triples), chunk_size):
-            chunk = triples[i:i + chunk_size]
-            triples_str = "\n".join(chunk)
-            
-            sparql_query = f"""
-            INSERT DATA {{
-                {triples_str}
-            }}
-            """
-            
-            try:
-                # Use SPARQLWrapper for cleaner query execution
-                sparql = SPARQLWrapper(update_url)
-                sparql.setCredentials("admin", "admin")
-                sparql.setMethod(POST)
-                sparql.setQuery(sparql_query)
-                sparql.query()
-            except Exception as e:
-                logger.error(f"Error inserting triples into {kb_id}: {e}")
-                return False
-                
+
+        # One Graph Store Protocol upload instead of many INSERT DATA updates
+        content = ("\n".join(triples) + "\n").encode("utf-8")
+        loaded = await self.upload_graph(kb_id, content, "application/n-triples")
+        if loaded is None:
+            logger.error(f"Error inserting triples into {kb_id}")
+            return False
         return True
 
-    def query_sparql(self, kb_id: str, query: str) -> dict:
+    async def upload_graph(
+        self,
+        kb_id: str,
+        content: Union[bytes, Iterable[bytes]],
+        content_type: str,
+        compress: Optional[bool] = None
+    ) -> Optional[int]:
+        """Upload RDF data (TriG, N-Quads, N-Triples...) via the Graph Store Protocol endpoint.
+
+        `content` may be a list of byte parts (e.g. several TriG files); they are
+        streamed as one request body, so Fuseki loads them in a single transaction.
+        Quad formats keep their named graphs; triple formats go to the default graph.
+
+        Returns the number of triples/quads Fuseki reports as loaded (0 if it
+        doesn't report a count), or None if the upload failed.
+        """
+        gsp_url = f"{self._get_dataset_url(kb_id)}/data"
+        parts = [content] if isinstance(content, (bytes, bytearray)) else list(content)
+        if compress is None:
+            compress = settings.FUSEKI_UPLOAD_GZIP
+
+        headers = {"Content-Type": content_type}
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+
+        async def body():
+            if not compress:
+                for part in parts:
+                    yield part
+                return
+            gzip = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+            for part in parts:
+                yield gzip.compress(part)
+            yield gzip.flush()
+
+        try:
+            response = await self._http.post(
+                gsp_url,
+                content=body(),
+                headers=headers,
+                auth=self.auth,
+                timeout=settings.FUSEKI_UPLOAD_TIMEOUT
+            )
+            if response.status_code in [200, 201, 204]:
+                try:
+                    stats = response.json()
+                    return int(stats.get("count") or stats.get("tripleCount", 0) + stats.get("quadCount", 0))
+                except Exception:
+                    return 0
+            logger.error(f"Failed to upload graph data to {kb_id}: {response.status_code} {response.text}")
+            return None
+        except Exception as e:
+            logger.error(f"Error uploading graph data to {kb_id}: {e}")
+            return None
+
+    async def query_sparql(self, kb_id: str, query: str) -> dict:
         """Execute a SPARQL SELECT query."""
         dataset_url = self._get_dataset_url(kb_id)
         query_url = f"{dataset_url}/query"
-        
+
         try:
-            sparql = SPARQLWrapper(query_url)
-            sparql.setCredentials("admin", "admin")
-            sparql.setQuery(query)
-            sparql.setReturnFormat(JSON)
-            results = sparql.query().convert()
-            return results
+            response = await self._http.post(
+                query_url,
+                data={"query": query},
+                headers={"Accept": "application/sparql-results+json"},
+                auth=self.auth
+            )
+            response.raise_for_status()
+            return response.json()
         except Exception as e:
             logger.error(f"Error executing SPARQL query on {kb_id}: {e}")
             return {}
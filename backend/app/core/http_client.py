@@ -0,0 +1,55 @@
+"""
+Shared async HTTP clients with keep-alive connection pooling.
+
+One pooled client per upstream service ("llm", "fuseki"), so each service gets
+its own connection limit and timeouts. httpx clients are bound to the event loop
+they were created on; a client is recreated if requested from a different loop
+(e.g. scripts calling asyncio.run repeatedly).
+"""
+
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+def _timeout_for(name: str) -> float:
+    return {
+        "llm": settings.LLM_HTTP_TIMEOUT,
+        "fuseki": settings.FUSEKI_HTTP_TIMEOUT,
+    }.get(name, settings.LLM_HTTP_TIMEOUT)
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Pooled AsyncClient for the named upstream service."""
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(name)
+    if entry is not None and entry[0] is loop and not entry[1].is_closed:
+        return entry[1]
+
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(_timeout_for(name), connect=settings.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    _clients[name] = (loop, client)
+    return client
+
+
+async def close_http_clients():
+    """Close the clients created on the current loop (application shutdown)."""
+    loop = asyncio.get_running_loop()
+    for name, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            _clients.pop(name, None)
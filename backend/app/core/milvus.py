@@ -1,5 +1,8 @@
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
 from app.core.config import settings
+from typing import Dict, List, Set
+import numpy as np
+import threading
 
 def connect_milvus():
     connections.connect(
@@ -8,8 +11,123 @@ def connect_milvus():
         port=settings.MILVUS_PORT
     )
 
-def create_collection(kb_id: str, metric_type: str = "COSINE"):
-    collection_name = f"kb_{kb_id.replace('-', '_')}"
+def collection_name_for(kb_id: str) -> str:
+    return f"kb_{kb_id.replace('-', '_')}"
+
+# Build params and search params per supported ANN index type
+INDEX_DEFAULTS = {
+    "FLAT": ({}, {}),
+    "IVF_FLAT": ({"nlist": 1024}, {"nprobe": 10}),
+    "IVF_SQ8": ({"nlist": 1024}, {"nprobe": 10}),
+    "IVF_PQ": ({"nlist": 1024, "m": 96, "nbits": 8}, {"nprobe": 16}),
+    "HNSW": ({"M": 16, "efConstruction": 200}, {"ef": 64}),
+    "DISKANN": ({}, {"search_list": 100}),
+}
+
+# Collections created before index types were configurable
+LEGACY_INDEX_TYPE = "IVF_FLAT"
+DEFAULT_INDEX_TYPE = "HNSW"
+
+
+def _pq_m(dim: int) -> int:
+    """Number of PQ sub-quantizers: must divide dim; aim for ~16 dims per sub-vector."""
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def recommend_index(num_entities: int, dim: int = 1536) -> tuple:
+    """Pick (index_type, build_params, search_params) for a collection of the given size.
+
+    - < 2M vectors: HNSW (best recall/latency, no training; memory is fine at this scale)
+    - < 20M vectors: IVF_PQ (compressed, ~dim/4 bytes per vector)
+    - larger: DiskANN (graph on SSD)
+    """
+    if num_entities < 2_000_000:
+        return "HNSW", {"M": 16, "efConstruction": 200}, {"ef": 64}
+
+    # IVF rule of thumb: nlist ~ 4 * sqrt(N), probe ~ 1-3% of the lists
+    nlist = min(65536, max(16, int(4 * num_entities ** 0.5)))
+    nprobe = min(256, max(8, nlist // 64))
+    if num_entities < 20_000_000:
+        return "IVF_PQ", {"nlist": nlist, "m": _pq_m(dim), "nbits": 8}, {"nprobe": nprobe}
+    return "DISKANN", {}, {"search_list": 100}
+
+
+def resolve_index_config(index_type: str = None, index_params: dict = None, search_params: dict = None, dim: int = 1536) -> tuple:
+    """Fill in defaults for a (possibly partial) index configuration. Raises ValueError for unknown types."""
+    index_type = (index_type or DEFAULT_INDEX_TYPE).upper()
+    if index_type not in INDEX_DEFAULTS:
+        raise ValueError(f"Unsupported index type: {index_type}. Supported: {', '.join(INDEX_DEFAULTS)}")
+    default_build, default_search = INDEX_DEFAULTS[index_type]
+    build = dict(default_build)
+    if index_type == "IVF_PQ":
+        build["m"] = _pq_m(dim)
+    build.update(index_params or {})
+    search = dict(default_search)
+    search.update(search_params or {})
+    return index_type, build, search
+
+
+# Allowed range per build param (Milvus rejects values outside them at create_index time)
+INDEX_PARAM_RANGES = {
+    "nlist": (1, 65536),
+    "m": (1, 65536),
+    "nbits": (1, 16),
+    "M": (2, 2048),
+    "efConstruction": (1, 2 ** 31 - 1),
+}
+
+
+def validate_index_params(index_type: str, index_params: dict, dim: int = 1536):
+    """Check build params before touching an existing index. Raises ValueError."""
+    if index_type not in INDEX_DEFAULTS:
+        raise ValueError(f"Unsupported index type: {index_type}. Supported: {', '.join(INDEX_DEFAULTS)}")
+    for key, value in (index_params or {}).items():
+        if key not in INDEX_PARAM_RANGES:
+            continue
+        low, high = INDEX_PARAM_RANGES[key]
+        if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+            raise ValueError(f"Invalid {index_type} parameter {key}={value!r}: expected an integer in [{low}, {high}]")
+    if index_type == "IVF_PQ" and dim % index_params.get("m", 1):
+        raise ValueError(f"IVF_PQ parameter m={index_params['m']} must divide the vector dimension {dim}")
+
+
+def ann_search_params(metric_type: str, params: dict = None, limit: int = 0) -> dict:
+    """Search params for collection.search().
+
+    HNSW's ef and DiskANN's search_list must be at least the number of results requested.
+    """
+    params = dict(params) if params else dict(INDEX_DEFAULTS[LEGACY_INDEX_TYPE][1])
+    if "ef" in params:
+        params["ef"] = max(int(params["ef"]), limit)
+    if "search_list" in params:
+        params["search_list"] = max(int(params["search_list"]), limit)
+    return {"metric_type": metric_type, "params": params}
+
+
+def normalize_vectors(vectors: List[List[float]]) -> List[List[float]]:
+    """L2-normalize vectors so that IP (and L2) rank exactly like cosine."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).tolist()
+
+
+def distance_to_cosine(distance: float, metric_type: str) -> float:
+    """Map a Milvus hit distance to cosine similarity.
+
+    COSINE returns the similarity itself; IP equals cosine because vectors are stored
+    normalized; Milvus L2 is the squared distance, and for unit vectors |a-b|^2 = 2 - 2cos.
+    """
+    if metric_type == "L2":
+        return 1.0 - float(distance) / 2.0
+    return max(-1.0, min(1.0, float(distance)))
+
+
+def create_collection(kb_id: str, metric_type: str = "COSINE", dim: int = 1536, index_type: str = None, index_params: dict = None):
+    collection_name = collection_name_for(kb_id)
     
     if utility.has_collection(collection_name):
         col = Collection(collection_name)
@@ -18,6 +136,7 @@ def create_collection(kb_id: str, metric_type: str = "COSINE"):
         if not has_metadata:
             print(f"Collection {collection_name} has outdated schema (missing metadata). Dropping and recreating.")
             utility.drop_collection(collection_name)
+            collection_registry.invalidate(kb_id)
         else:
             return col
     
@@ -27,16 +146,136 @@ def create_collection(kb_id: str, metric_type: str = "COSINE"):
         FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=64),
         FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
         FieldSchema(name="metadata", dtype=DataType.JSON),
-        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=1536) # Assuming OpenAI embedding dim
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dim) # Embedding provider dimension
     ]
     
     schema = CollectionSchema(fields, "Knowledge Base Collection")
     collection = Collection(collection_name, schema)
     
+    index_type, build_params, _ = resolve_index_config(index_type, index_params, dim=dim)
     index_params = {
         "metric_type": metric_type,  # Use provided metric_type (COSINE or IP)
-        "index_type": "IVF_FLAT",
-        "params": {"nlist": 1024}
+        "index_type": index_type,
+        "params": build_params
     }
     collection.create_index(field_name="vector", index_params=index_params)
     return collection
+
+
+def rebuild_index(
+    kb_id: str,
+    metric_type: str,
+    index_type: str,
+    index_params: dict,
+    previous_index_type: str = None,
+    previous_index_params: dict = None
+):
+    """Replace the vector index of an existing collection in place (data is kept).
+
+    Milvus only allows one index per field and requires the collection to be released
+    to drop it, so searches on this KB fail until the new index is built and loaded.
+    If building the new index fails, the previous index (previous_index_type/params,
+    legacy IVF_FLAT if unknown) is recreated and loaded before the error is re-raised.
+    """
+    collection = collection_registry.get(kb_id, load=False)
+    dim = next((f.params.get("dim") for f in collection.schema.fields if f.name == "vector"), None) or 1536
+    # Fail before dropping anything
+    validate_index_params(index_type, index_params, dim=dim)
+
+    def build(build_type: str, build_params: dict):
+        collection.create_index(
+            field_name="vector",
+            index_params={"metric_type": metric_type, "index_type": build_type, "params": build_params}
+        )
+        utility.wait_for_index_building_complete(collection.name)
+
+    collection_registry.begin_rebuild(kb_id)
+    try:
+        collection.flush()
+        collection.release()
+        try:
+            collection.drop_index()
+        except Exception as e:
+            print(f"No existing index to drop for KB {kb_id}: {e}")
+        try:
+            build(index_type, index_params)
+        except Exception as e:
+            print(f"Building {index_type} index failed for KB {kb_id} ({e}). Restoring previous index.")
+            try:
+                collection.drop_index()
+            except Exception:
+                pass
+            old_type, old_params, _ = resolve_index_config(
+                previous_index_type or LEGACY_INDEX_TYPE, previous_index_params, dim=dim
+            )
+            build(old_type, old_params)
+            collection_registry.end_rebuild(kb_id)
+            collection_registry.get(kb_id)
+            raise
+    finally:
+        collection_registry.end_rebuild(kb_id)
+    # Load again through the registry so searches can use it immediately
+    collection_registry.get(kb_id)
+
+class CollectionRegistry:
+    """Process-wide cache of per-KB Milvus collection handles.
+
+    create_collection() does a has_collection round trip and a schema check, and
+    load() is another RPC; the registry does both once per KB and remembers which
+    collections are already loaded. Call invalidate() whenever a collection is
+    dropped or recreated.
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, Collection] = {}
+        self._loaded: Set[str] = set()
+        self._rebuilding: Set[str] = set()
+        # Re-entrant: create_collection() invalidates when it recreates an outdated collection
+        self._lock = threading.RLock()
+
+    def get(self, kb_id: str, load: bool = True, **create_kwargs) -> Collection:
+        """Return the collection of a KB, creating it if needed (create_kwargs only apply then)."""
+        with self._lock:
+            collection = self._collections.get(kb_id)
+            if collection is None:
+                collection = create_collection(kb_id, **create_kwargs)
+                self._collections[kb_id] = collection
+
+            if load and kb_id not in self._loaded:
+                if kb_id in self._rebuilding:
+                    raise RuntimeError(f"Vector index of Knowledge Base {kb_id} is being rebuilt. Try again later.")
+                collection.load()
+                self._loaded.add(kb_id)
+            return collection
+
+    def begin_rebuild(self, kb_id: str):
+        """Mark a KB as unsearchable while its index is dropped and rebuilt."""
+        with self._lock:
+            self._rebuilding.add(kb_id)
+            self._loaded.discard(kb_id)
+
+    def end_rebuild(self, kb_id: str):
+        with self._lock:
+            self._rebuilding.discard(kb_id)
+
+    def is_rebuilding(self, kb_id: str) -> bool:
+        return kb_id in self._rebuilding
+
+    def invalidate(self, kb_id: str):
+        """Forget the handle of a KB (collection dropped, recreated or released)."""
+        with self._lock:
+            self._collections.pop(kb_id, None)
+            self._loaded.discard(kb_id)
+
+    def clear(self):
+        with self._lock:
+            self._collections.clear()
+            self._loaded.clear()
+
+
+collection_registry = CollectionRegistry()
+
+
+def get_collection(kb_id: str, load: bool = True, **kwargs) -> Collection:
+    """Cached, loaded collection for a KB (see CollectionRegistry)."""
+    return collection_registry.get(kb_id, load=load, **kwargs)
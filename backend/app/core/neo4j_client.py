@@ -1,37 +1,124 @@
-
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import ClientError
 from app.core.config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# RAGaaS graph model: (:Entity {kb_id, name, label_ko})-[:MENTIONED_IN]->(:Chunk {id, kb_id})
+# (name, statement, fallback index statement if the constraint can't be created)
+SCHEMA_STATEMENTS = [
+    (
+        "chunk_id_unique",
+        "CREATE CONSTRAINT chunk_id_unique IF NOT EXISTS FOR (c:Chunk) REQUIRE c.id IS UNIQUE",
+        "CREATE INDEX chunk_id IF NOT EXISTS FOR (c:Chunk) ON (c.id)",
+    ),
+    (
+        "entity_kb_name_unique",
+        "CREATE CONSTRAINT entity_kb_name_unique IF NOT EXISTS FOR (e:Entity) REQUIRE (e.kb_id, e.name) IS UNIQUE",
+        "CREATE INDEX entity_kb_name IF NOT EXISTS FOR (e:Entity) ON (e.kb_id, e.name)",
+    ),
+    (
+        "entity_kb_label_ko",
+        "CREATE INDEX entity_kb_label_ko IF NOT EXISTS FOR (e:Entity) ON (e.kb_id, e.label_ko)",
+        None,
+    ),
+    (
+        "chunk_kb_id",
+        "CREATE INDEX chunk_kb_id IF NOT EXISTS FOR (c:Chunk) ON (c.kb_id)",
+        None,
+    ),
+]
+
+class Neo4jBatchWriteError(Exception):
+    """Some rows of a batched write could not be written; all other rows were committed."""
+
+    def __init__(self, written: int, failed_rows: list, error: Exception):
+        self.written = written
+        self.failed_rows = failed_rows
+        self.error = error
+        super().__init__(
+            f"{len(failed_rows)} of {written + len(failed_rows)} rows failed to write to Neo4j: {error}"
+        )
+
 class Neo4jClient:
+    """Async Neo4j client.
+
+    The async driver's connection pool is bound to the event loop it was created
+    on, so the driver is created lazily and recreated if used from another loop
+    (e.g. scripts calling asyncio.run more than once).
+    """
+
     def __init__(self):
-        self.driver = None
         self.uri = settings.NEO4J_URI
         self.user = settings.NEO4J_USER
         self.password = settings.NEO4J_PASSWORD
-        
-        if self.uri:
+        self._driver = None
+        self._driver_loop = None
+        self._stale_drivers = []
+        self._schema_ready = False
+        self._schema_lock = None
+
+    @property
+    def driver(self):
+        if not self.uri:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._driver is None or self._driver_loop is not loop:
+            if self._driver is not None:
+                self._discard_driver(self._driver, self._driver_loop)
+                self._driver = None
             try:
-                self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+                self._driver = AsyncGraphDatabase.driver(
+                    self.uri,
+                    auth=(self.user, self.password),
+                    max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+                    connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                    connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT,
+                    max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME,
+                    keep_alive=True,
+                )
+                self._driver_loop = loop
                 logger.info("Initialized Neo4j driver")
             except Exception as e:
                 logger.error(f"Failed to initialize Neo4j driver: {e}")
+                self._driver = None
+        return self._driver
+
+    def _discard_driver(self, driver, loop):
+        """Close a driver bound to another event loop (its connections belong to that loop).
 
-    def close(self):
-        if self.driver:
-            self.driver.close()
+        If that loop is still running, the driver is closed there; otherwise it is
+        kept and closed by close() at shutdown.
+        """
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(driver.close(), loop)
+        else:
+            self._stale_drivers.append(driver)
 
-    def execute_query(self, query: str, parameters: dict = None, db: str = None):
+    async def close(self):
+        stale, self._stale_drivers = self._stale_drivers, []
+        for driver in stale:
+            try:
+                await driver.close()
+            except Exception as e:
+                logger.warning(f"Failed to close stale Neo4j driver: {e}")
+        if self._driver:
+            await self._driver.close()
+            self._driver = None
+            self._driver_loop = None
+
+    async def execute_query(self, query: str, parameters: dict = None, db: str = None):
         """Execute a Cypher query."""
-        if not self.driver:
+        driver = self.driver
+        if not driver:
             logger.error("Neo4j driver not initialized")
             return []
 
         try:
-            records, summary, keys = self.driver.execute_query(
-                query, 
+            records, summary, keys = await driver.execute_query(
+                query,
                 parameters_=parameters,
                 database_=db
             )
@@ -40,11 +127,120 @@ class Neo4jClient:
             logger.error(f"Error executing Neo4j query: {e}")
             raise e
 
-    def verify_connectivity(self):
-        if not self.driver:
+    async def execute_batched(
+        self,
+        query: str,
+        rows: list,
+        parameters: dict = None,
+        batch_size: int = None,
+        db: str = None
+    ) -> int:
+        """Run an `UNWIND $rows AS row ...` write query over `rows` in batches.
+
+        Each batch is one explicit write transaction (retried by the driver on
+        transient errors). A batch rejected by the database (e.g. one row with an
+        invalid value) is retried in halves until the bad rows are isolated, so
+        they don't take the rest of the batch with them. Connection-level errors
+        stop the write.
+
+        Returns the number of rows written. Raises Neo4jBatchWriteError (after
+        writing everything else) if any row could not be written.
+        """
+        driver = self.driver
+        if not driver:
+            logger.error("Neo4j driver not initialized")
+            return 0
+
+        batch_size = batch_size or settings.NEO4J_WRITE_BATCH_SIZE
+        written = [False] * len(rows)
+        first_error = None
+
+        async def write(tx, batch):
+            result = await tx.run(query, {**(parameters or {}), "rows": batch})
+            await result.consume()
+
+        async def write_range(session, start: int, end: int):
+            nonlocal first_error
+            try:
+                await session.execute_write(write, rows[start:end])
+                written[start:end] = [True] * (end - start)
+            except ClientError as e:
+                if end - start == 1:
+                    logger.error(f"Neo4j write failed for row {start}: {e}")
+                    first_error = first_error or e
+                    return
+                logger.warning(f"Neo4j batch write failed (rows {start}-{end - 1}), retrying in halves: {e}")
+                mid = (start + end) // 2
+                await write_range(session, start, mid)
+                await write_range(session, mid, end)
+
+        try:
+            async with driver.session(database=db) as session:
+                for i in range(0, len(rows), batch_size):
+                    await write_range(session, i, min(i + batch_size, len(rows)))
+        except Exception as e:
+            logger.error(f"Neo4j batched write aborted: {e}")
+            first_error = first_error or e
+
+        count = sum(written)
+        if count < len(rows):
+            failed_rows = [row for row, ok in zip(rows, written) if not ok]
+            raise Neo4jBatchWriteError(count, failed_rows, first_error)
+        return count
+
+    async def ensure_schema(self) -> bool:
+        """Create the indexes/constraints of the graph model (idempotent) and verify they are online.
+
+        If a uniqueness constraint can't be created (e.g. existing duplicates), the
+        equivalent plain index is created instead so lookups stay index-backed.
+        Only marked ready when every item (or its fallback) was created; otherwise the
+        next call retries.
+        """
+        if self._schema_ready:
+            return True
+        if self._schema_lock is None:
+            self._schema_lock = asyncio.Lock()
+        async with self._schema_lock:
+            if self._schema_ready:
+                return True
+            if not await self.verify_connectivity():
+                return False
+
+            ok = True
+            for name, statement, fallback in SCHEMA_STATEMENTS:
+                try:
+                    await self.execute_query(statement)
+                except Exception as e:
+                    if not fallback:
+                        logger.error(f"Failed to create Neo4j schema item {name}: {e}")
+                        ok = False
+                        continue
+                    logger.warning(f"Could not create constraint {name} ({e}). Creating a plain index instead.")
+                    try:
+                        await self.execute_query(fallback)
+                    except Exception as e2:
+                        logger.error(f"Failed to create Neo4j index for {name}: {e2}")
+                        ok = False
+
+            try:
+                records = await self.execute_query("SHOW INDEXES YIELD name, state, labelsOrTypes, properties")
+                not_online = [r["name"] for r in records if r["state"] != "ONLINE"]
+                if not_online:
+                    logger.warning(f"Neo4j indexes not online yet (still populating?): {not_online}")
+                else:
+                    logger.info(f"Neo4j schema verified ({len(records)} indexes online)")
+            except Exception as e:
+                logger.warning(f"Could not verify Neo4j indexes: {e}")
+
+            self._schema_ready = ok
+            return ok
+
+    async def verify_connectivity(self):
+        driver = self.driver
+        if not driver:
             return False
         try:
-            self.driver.verify_connectivity()
+            await driver.verify_connectivity()
             return True
         except Exception as e:
             logger.error(f"Neo4j connectivity check failed: {e}")
@@ -60,7 +60,7 @@ async def main():
     try:
         # Neo4j 연결 확인 (동기 메서드일수도 있으니 확인)
         # verify_connectivity는 보통 동기이거나 async일 수 있음. neo4j_client 코드 확인 필요하지만 일단 진행.
-        if not neo4j_client.verify_connectivity():
+        if not await neo4j_client.verify_connectivity():
              print("Neo4j connection failed.")
              return
         
@@ -79,7 +79,7 @@ async def main():
         # records = neo4j_client.execute_query(cypher_query) 
         # await가 없습니다! -> 동기 함수입니다.
         
-        records = neo4j_client.execute_query(cypher)
+        records = await neo4j_client.execute_query(cypher)
         
         print(f"\nResult count: {len(records)}")
         for i, record in enumerate(records):
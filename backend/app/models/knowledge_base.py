@@ -15,6 +15,11 @@ class KnowledgeBase(Base):
     metric_type = Column(String, default="COSINE")  # COSINE or IP
     enable_graph_rag = Column(Boolean, default=False)
     graph_backend = Column(String, default="ontology", nullable=True) # ontology or neo4j
+    embedding_provider = Column(String, default="openai", nullable=True) # openai or local
+    embedding_model = Column(String, nullable=True) # None = provider default
+    index_type = Column(String, nullable=True) # HNSW, IVF_FLAT, IVF_PQ, DISKANN, ... (None = legacy IVF_FLAT)
+    index_params = Column(JSON, default={}) # Index build params (e.g. M, efConstruction, nlist)
+    search_params = Column(JSON, default={}) # ANN search params (e.g. ef, nprobe, search_list)
     is_promoted = Column(Boolean, default=False)
     promotion_metadata = Column(JSON, default={})
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -11,6 +11,11 @@ class KnowledgeBaseBase(BaseModel):
     metric_type: str = "COSINE"  # COSINE or IP
     enable_graph_rag: bool = False
     graph_backend: Optional[str] = "ontology"
+    embedding_provider: Optional[str] = None  # openai or local (None = server default)
+    embedding_model: Optional[str] = None
+    index_type: Optional[str] = None  # None = recommended for the collection size
+    index_params: Optional[dict] = None
+    search_params: Optional[dict] = None
     is_promoted: bool = False
 
 class KnowledgeBaseCreate(KnowledgeBaseBase):
@@ -31,3 +36,8 @@ class KnowledgeBase(KnowledgeBaseBase):
 class KnowledgeBaseUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+
+class IndexRebuildRequest(BaseModel):
+    index_type: Optional[str] = None  # None = recommended for the current collection size
+    index_params: Optional[dict] = None
+    search_params: Optional[dict] = None
@@ -1,17 +1,109 @@
-from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import List
+from app.services.embedding_cache import EmbeddingCache, text_hash
+from app.services.embedding_providers import EmbeddingProvider, EmbeddingProviderFactory
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
 
 class EmbeddingService:
+    """Entry point for all embedding calls.
+
+    The actual model is a pluggable EmbeddingProvider (selected per Knowledge Base);
+    this service adds the persistent content-addressed cache and the in-process
+    query embedding cache on top of it.
+    """
+
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-
-    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        # OpenAI embedding model
-        response = await self.client.embeddings.create(
-            input=texts,
-            model="text-embedding-3-small"
-        )
-        return [data.embedding for data in response.data]
+        self.cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            try:
+                self.cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES)
+            except Exception as e:
+                logger.warning(f"Embedding cache disabled: {e}")
+
+        # In-process query embedding cache: (namespace, query) -> (created_at, vector)
+        self._query_cache: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._query_cache_size = settings.QUERY_EMBEDDING_CACHE_SIZE
+        self._query_cache_ttl = settings.QUERY_EMBEDDING_CACHE_TTL
+        # Singleflight: (namespace, query) -> in-flight embedding task
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.query_hits = 0
+        self.query_misses = 0
+        self.query_coalesced = 0
+
+    def _resolve(self, provider: Optional[EmbeddingProvider]) -> EmbeddingProvider:
+        return provider or EmbeddingProviderFactory.get_provider()
+
+    async def get_embeddings(self, texts: List[str], provider: Optional[EmbeddingProvider] = None) -> List[List[float]]:
+        """Embed texts, serving repeats from the persistent cache.
+
+        Results are returned in the same order as the input texts.
+        """
+        if not texts:
+            return []
+        provider = self._resolve(provider)
+        if not self.cache:
+            return await provider.embed(texts)
+
+        # Vectors of different models must never be mixed
+        namespace = provider.cache_namespace
+        hashes = [text_hash(t) for t in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, namespace, hashes)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+
+        if missing:
+            vectors = await provider.embed(list(missing.values()))
+            new_items = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.cache.put_many, namespace, new_items)
+            cached.update(new_items)
+
+        return [cached[h] for h in hashes]
+
+    async def get_query_embedding(self, query: str, provider: Optional[EmbeddingProvider] = None) -> List[float]:
+        """Embed a single search query with an LRU/TTL cache.
+
+        Concurrent calls for the same query share one in-flight provider call.
+        """
+        provider = self._resolve(provider)
+        key = (provider.cache_namespace, query)
+
+        entry = self._query_cache.get(key)
+        if entry is not None:
+            created_at, vector = entry
+            if time.monotonic() - created_at < self._query_cache_ttl:
+                self._query_cache.move_to_end(key)
+                self.query_hits += 1
+                return vector
+            del self._query_cache[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.query_misses += 1
+            task = asyncio.ensure_future(self._embed_query(key, provider))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.query_coalesced += 1
+
+        # Shield so one cancelled waiter doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _embed_query(self, key: Tuple[str, str], provider: EmbeddingProvider) -> List[float]:
+        vector = (await self.get_embeddings([key[1]], provider=provider))[0]
+        self._query_cache[key] = (time.monotonic(), vector)
+        self._query_cache.move_to_end(key)
+        while len(self._query_cache) > self._query_cache_size:
+            self._query_cache.popitem(last=False)
+        return vector
 
 embedding_service = EmbeddingService()
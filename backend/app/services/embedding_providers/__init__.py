@@ -0,0 +1,6 @@
+from .base import EmbeddingProvider
+from .factory import EmbeddingProviderFactory
+from .openai_provider import OpenAIEmbeddingProvider
+from .local import LocalEmbeddingProvider
+
+__all__ = ["EmbeddingProvider", "EmbeddingProviderFactory", "OpenAIEmbeddingProvider", "LocalEmbeddingProvider"]
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+
+class EmbeddingProvider(ABC):
+    """Abstract base class for embedding backends."""
+
+    name: str = ""
+
+    @property
+    @abstractmethod
+    def model(self) -> str:
+        """Model identifier (name or local path)."""
+        pass
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Vector dimension, used for the Milvus collection schema."""
+        pass
+
+    @property
+    def cache_namespace(self) -> str:
+        """Key namespace for embedding caches. Must change whenever vectors would change."""
+        return self.model
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning vectors in input order.
+
+        Args:
+            texts: Non-empty list of texts
+
+        Returns:
+            List of vectors, one per input text
+        """
+        pass
@@ -0,0 +1,46 @@
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from .base import EmbeddingProvider
+from .openai_provider import OpenAIEmbeddingProvider
+from .local import LocalEmbeddingProvider
+
+
+class EmbeddingProviderFactory:
+    """Factory for creating (and reusing) EmbeddingProvider instances."""
+
+    _providers: Dict[Tuple[str, Optional[str]], EmbeddingProvider] = {}
+
+    @classmethod
+    def default_provider_name(cls) -> str:
+        """Provider for new Knowledge Bases when none is requested."""
+        if settings.USE_LOCAL_MODEL:
+            return "local"
+        return settings.DEFAULT_EMBEDDING_PROVIDER
+
+    @classmethod
+    def get_provider(cls, provider_name: Optional[str] = None, model: Optional[str] = None) -> EmbeddingProvider:
+        """Get or create an embedding provider instance."""
+        provider_key = (provider_name or cls.default_provider_name()).lower()
+        key = (provider_key, model or None)
+
+        if key not in cls._providers:
+            if provider_key in ["local", "sentence-transformers", "onnx"]:
+                backend = "onnx" if provider_key == "onnx" else None
+                cls._providers[key] = LocalEmbeddingProvider(model=model, backend=backend)
+            elif provider_key == "openai":
+                cls._providers[key] = OpenAIEmbeddingProvider(model=model)
+            else:
+                raise ValueError(f"Unknown embedding provider: {provider_name}")
+
+        return cls._providers[key]
+
+    @classmethod
+    def for_kb(cls, kb) -> EmbeddingProvider:
+        """Provider configured on a KnowledgeBase.
+
+        KBs created before providers were selectable have no value and were embedded with OpenAI.
+        """
+        return cls.get_provider(
+            getattr(kb, "embedding_provider", None) or "openai",
+            getattr(kb, "embedding_model", None)
+        )
@@ -0,0 +1,118 @@
+from app.core.config import settings
+from typing import List, Optional
+from .base import EmbeddingProvider
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """CPU embeddings with sentence-transformers (no external API).
+
+    Supports the PyTorch and ONNX Runtime backends and optional int8 dynamic
+    quantization (PyTorch backend). Inputs are length-sorted into dynamic batches
+    bounded by a character budget, so short texts are packed densely and long texts
+    don't pad a whole batch.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        backend: Optional[str] = None,
+        quantize: Optional[str] = None,
+    ):
+        self._model_path = model or settings.LOCAL_MODEL_PATH
+        self.backend = (backend or settings.LOCAL_EMBEDDING_BACKEND).lower()
+        self.quantize = (quantize or settings.LOCAL_EMBEDDING_QUANTIZE or "none").lower()
+        self.max_batch_chars = settings.LOCAL_EMBEDDING_BATCH_MAX_CHARS
+        self.max_batch_size = settings.LOCAL_EMBEDDING_BATCH_MAX_SIZE
+        self._encoder = None
+        self._load_lock = threading.Lock()
+        # One encode at a time; torch/onnxruntime already use all cores per call
+        self._encode_lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self._model_path
+
+    @property
+    def cache_namespace(self) -> str:
+        # Full path (or hub model id), so different models with the same directory name
+        # never share cached vectors; the hash keeps the key short
+        model_id = os.path.abspath(self._model_path) if os.path.exists(self._model_path) else self._model_path
+        model_hash = hashlib.sha256(model_id.encode("utf-8")).hexdigest()[:12]
+        name = os.path.basename(self._model_path.rstrip("/"))
+        return f"local:{name}-{model_hash}:{self.backend}:{self.quantize}"
+
+    @property
+    def dimension(self) -> int:
+        return self._get_encoder().get_sentence_embedding_dimension()
+
+    def _get_encoder(self):
+        """Lazy-load the model (thread-safe)."""
+        if self._encoder is not None:
+            return self._encoder
+        with self._load_lock:
+            if self._encoder is not None:
+                return self._encoder
+
+            from sentence_transformers import SentenceTransformer  # type: ignore
+
+            logger.info(f"Loading local embedding model: {self._model_path} (backend={self.backend}, quantize={self.quantize})")
+            if self.backend == "onnx":
+                model_kwargs = {}
+                if settings.LOCAL_EMBEDDING_ONNX_FILE:
+                    # e.g. a pre-quantized "onnx/model_qint8_avx2.onnx"
+                    model_kwargs["file_name"] = settings.LOCAL_EMBEDDING_ONNX_FILE
+                encoder = SentenceTransformer(self._model_path, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+            else:
+                encoder = SentenceTransformer(self._model_path, device="cpu")
+                if self.quantize == "int8":
+                    import torch
+                    encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+
+            self._encoder = encoder
+        return self._encoder
+
+    def _make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Dynamic batching: length-sorted indices grouped under a character budget."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = []
+        current: List[int] = []
+        current_chars = 0
+        for i in order:
+            n_chars = len(texts[i])
+            if current and (current_chars + n_chars > self.max_batch_chars or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(i)
+            current_chars += n_chars
+        if current:
+            batches.append(current)
+        return batches
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        encoder = self._get_encoder()
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        with self._encode_lock:
+            for batch in self._make_batches(texts):
+                vectors = encoder.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=False
+                )
+                for i, vector in zip(batch, vectors):
+                    results[i] = vector.tolist()
+        return results
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        # Inference is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self._encode, texts)
@@ -0,0 +1,124 @@
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from app.core.config import settings
+from typing import List, Optional
+from .base import EmbeddingProvider
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying (transient provider / network failures)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# Per-input token limit of the OpenAI embedding models
+MAX_INPUT_TOKENS = 8191
+
+# Token estimate per character when tiktoken cannot be loaded
+FALLBACK_TOKENS_PER_CHAR = 2
+
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings with token-budgeted batching, bounded concurrency and retries."""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None):
+        # Retries are handled per batch below
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self._model = model or settings.EMBEDDING_MODEL
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_inputs = settings.EMBEDDING_BATCH_MAX_INPUTS
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
+        self._semaphore = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+        self._encoding = None
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return MODEL_DIMENSIONS.get(self._model, 1536)
+
+    def _get_encoding(self):
+        """Lazy tiktoken encoder (cl100k_base is used by the text-embedding-3 models).
+
+        tiktoken downloads the encoding on first use; when that is impossible
+        (e.g. air-gapped hosts without a TIKTOKEN_CACHE_DIR) fall back to counting characters.
+        """
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable ({e}). Estimating tokens by character count.")
+                self._encoding = False
+        return self._encoding
+
+    def _prepare(self, text: str) -> tuple[str, int]:
+        """Return (text, token_count), truncating inputs above the model's per-input limit."""
+        encoding = self._get_encoding()
+        if not encoding:
+            # Conservative estimate: Hangul can take more than one token per character
+            text = text[:MAX_INPUT_TOKENS // FALLBACK_TOKENS_PER_CHAR]
+            return text, len(text) * FALLBACK_TOKENS_PER_CHAR
+
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) > MAX_INPUT_TOKENS:
+            logger.warning(f"Embedding input truncated from {len(tokens)} to {MAX_INPUT_TOKENS} tokens")
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = encoding.decode(tokens)
+        return text, len(tokens)
+
+    def _make_batches(self, texts: List[str]) -> List[List[tuple[int, str]]]:
+        """Group inputs into batches bounded by the token budget and the input count."""
+        batches = []
+        current: List[tuple[int, str]] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            text, n_tokens = self._prepare(text)
+            if current and (current_tokens + n_tokens > self.max_batch_tokens or len(current) >= self.max_batch_inputs):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((i, text))
+            current_tokens += n_tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_batch(self, batch: List[tuple[int, str]]) -> List[List[float]]:
+        """Embed one batch with bounded concurrency and exponential backoff."""
+        inputs = [text for _, text in batch]
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self.client.embeddings.create(input=inputs, model=self._model)
+                    # The API returns items with an index; sort defensively
+                    data = sorted(response.data, key=lambda d: d.index)
+                    return [d.embedding for d in data]
+                except RETRYABLE_ERRORS as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                    logger.warning(f"Embedding batch of {len(inputs)} failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                    await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts using token-budgeted batches sent concurrently (input order preserved)."""
+        batches = self._make_batches(texts)
+        batch_results = await asyncio.gather(*(self._embed_batch(b) for b in batches))
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, vectors in zip(batches, batch_results):
+            for (i, _), vector in zip(batch, vectors):
+                results[i] = vector
+        return results
@@ -6,7 +6,7 @@ import uuid
 import json
 from pathlib import Path
 from app.core.config import settings
-from app.core.milvus import connect_milvus, create_collection
+from app.core.milvus import connect_milvus, get_collection
 from app.services.embedding import embedding_service
 from pymilvus import Collection
 import asyncio
@@ -127,13 +127,20 @@ class Doc2OntoProcessor:
             print(f"[Doc2Onto] Pipeline completed. Stats: {result}")
             
             if graph_backend == "neo4j":
-                await self._load_to_neo4j(output_dir, kb_id, doc_id)
+                from app.core.neo4j_client import Neo4jBatchWriteError
+                load_error = None
+                try:
+                    await self._load_to_neo4j(output_dir, kb_id, doc_id)
+                except Neo4jBatchWriteError as e:
+                    # The other triples were written: still link their entities, then report it
+                    load_error = e
                 # RAGaaS: Create Entity-Chunk connections
                 await self._link_entities_to_chunks_neo4j(output_dir, kb_id, doc_id)
+                if load_error:
+                    raise load_error
             else:
-                await self._load_to_fuseki(output_dir, kb_id)
-                # RAGaaS: Create Entity-Chunk connections for Fuseki as well
-                await self._link_entities_to_chunks_fuseki(output_dir, kb_id, doc_id)
+                # Includes the RAGaaS Entity-Chunk connections
+                await self._load_to_fuseki(output_dir, kb_id, doc_id)
             
             # Note: Milvus loading in Doc2Onto is redundant when using RAGaaS hybrid approach.
             # Chunks are already indexed by RAGaaS before calling Doc2Onto.
@@ -151,11 +158,14 @@ class Doc2OntoProcessor:
                 # shutil.rmtree(output_dir, ignore_errors=True)
                 pass
 
-    async def _load_to_fuseki(self, output_dir: str, kb_id: str):
-        """Load TriG files to Fuseki using RAGaaS's fuseki_client for proper auth."""
+    async def _load_to_fuseki(self, output_dir: str, kb_id: str, doc_id: str):
+        """Load the TriG output and the Entity-Chunk links to Fuseki in one upload.
+
+        base.trig, evidence.trig and the generated ragaas:mentionedIn triples are
+        streamed (gzip-compressed if FUSEKI_UPLOAD_GZIP) as a single TriG body to the
+        Graph Store Protocol endpoint, so the whole document loads in one transaction.
+        """
         from app.core.fuseki import fuseki_client
-        import requests
-        from requests.auth import HTTPBasicAuth
         
         base_trig = os.path.join(output_dir, "base.trig")
         evidence_trig = os.path.join(output_dir, "evidence.trig")
@@ -164,34 +174,65 @@ class Doc2OntoProcessor:
         safe_name = f"kb_{kb_id.replace('-', '_')}"
         
         # Ensure dataset exists
-        fuseki_client.create_dataset(kb_id)
+        await fuseki_client.create_dataset(kb_id)
+        
+        parts = []
+        for trig_path in [base_trig, evidence_trig]:
+            if os.path.exists(trig_path):
+                with open(trig_path, "rb") as f:
+                    # Newline-separated: concatenated TriG documents are still valid TriG
+                    parts.append(f.read() + b"\n")
         
-        # Upload using GSP with auth
-        gsp_url = f"{settings.FUSEKI_URL}/{safe_name}/data"
-        auth = HTTPBasicAuth("admin", "admin")
+        # RAGaaS: Entity-Chunk connections (default graph)
+        try:
+            links = await asyncio.to_thread(self._build_fuseki_mention_links, output_dir, doc_id, base_trig)
+        except Exception as e:
+            print(f"[RAGaaS] Failed to build Entity-Chunk connections for Fuseki: {e}")
+            links = []
+        if links:
+            parts.append("\n".join(links).encode("utf-8") + b"\n")
+        
+        if not parts:
+            print(f"[Doc2Onto] No TriG output to upload")
+            return
         
         print(f"[Doc2Onto] Uploading to Fuseki dataset: {safe_name}")
+        loaded = await fuseki_client.upload_graph(kb_id, parts, "application/trig")
+        if loaded is None:
+            print(f"[Doc2Onto] Failed to upload graph data to Fuseki")
+        else:
+            print(f"[Doc2Onto] Loaded {loaded} triples to Fuseki ({len(links)} Entity-Chunk connections)")
+
+    def _build_fuseki_mention_links(self, output_dir: str, doc_id: str, base_trig: str) -> List[str]:
+        """N-Triples lines `<entity> ragaas:mentionedIn "chunk_id" .` built client-side.
+
+        Entities are resolved to IRIs through the rdfs:label -> IRI map of base.trig
+        (matching the label as-is or with spaces replaced by underscores, as
+        Doc2Onto does in some cases) instead of a label-scanning SPARQL update per link.
+        """
+        candidates_path = os.path.join(output_dir, "candidates_filtered.jsonl")
+        if not os.path.exists(candidates_path) or not os.path.exists(base_trig):
+            return []
         
-        for trig_path in [base_trig, evidence_trig]:
-            if os.path.exists(trig_path):
-                try:
-                    with open(trig_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    
-                    response = requests.post(
-                        gsp_url,
-                        data=content.encode("utf-8"),
-                        headers={"Content-Type": "application/trig"},
-                        auth=auth,
-                        timeout=60
-                    )
-                    
-                    if response.status_code in [200, 201, 204]:
-                        print(f"[Doc2Onto] Uploaded {os.path.basename(trig_path)} to Fuseki")
-                    else:
-                        print(f"[Doc2Onto] Failed to upload {os.path.basename(trig_path)}: {response.status_code} {response.text}")
-                except Exception as e:
-                    print(f"[Doc2Onto] Error uploading {trig_path}: {e}")
+        from rdflib import Dataset, Literal, URIRef
+        from rdflib.namespace import RDFS
+        
+        dataset = Dataset()
+        dataset.parse(base_trig, format="trig")
+        label_iris = {}  # label -> set of entity IRIs
+        for subject, _, label, _ in dataset.quads((None, RDFS.label, None, None)):
+            if isinstance(subject, URIRef):
+                label_iris.setdefault(str(label), set()).add(subject)
+        
+        mentioned_in = URIRef("http://ragaas.com/schema/mentionedIn")
+        links = set()
+        for entity_name, chunk_ids in self._read_entity_chunks(candidates_path, doc_id).items():
+            iris = label_iris.get(entity_name, set()) | label_iris.get(entity_name.replace(" ", "_"), set())
+            for iri in iris:
+                for chunk_id in chunk_ids:
+                    links.add(f"{iri.n3()} {mentioned_in.n3()} {Literal(chunk_id).n3()} .")
+        
+        return sorted(links)
 
     async def _load_to_neo4j(self, output_dir: str, kb_id: str, doc_id: str):
         """
@@ -201,23 +242,9 @@ class Doc2OntoProcessor:
         print(f"[Doc2Onto] Loading to Neo4j (using direct adapter)...")
         await self._load_to_neo4j_legacy(output_dir, kb_id, doc_id)
 
-    async def _link_entities_to_chunks_neo4j(self, output_dir: str, kb_id: str, doc_id: str):
-        """Create Entity-Chunk connections in Neo4j (RAGaaS responsibility).
-        
-        Doc2Onto stores entities and triples, but RAGaaS needs to link them
-        to chunks for retrieval purposes.
-        """
-        from app.core.neo4j_client import neo4j_client
-        
-        candidates_path = os.path.join(output_dir, "candidates_filtered.jsonl")
-        if not os.path.exists(candidates_path):
-            print(f"[RAGaaS] No candidates file for entity-chunk linking")
-            return
-        
-        print(f"[RAGaaS] Creating Entity-Chunk connections (Neo4j)...")
-        
-        # Collect entities and their source chunks
-        entity_chunks = {}  # entity_name -> set of chunk_ids
+    def _read_entity_chunks(self, candidates_path: str, doc_id: str) -> Dict[str, set]:
+        """entity_name -> set of Milvus chunk_ids, from the subjects/objects of the candidate triples."""
+        entity_chunks = {}
         
         with open(candidates_path, "r", encoding="utf-8") as f:
             for line in f:
@@ -252,149 +279,86 @@ class Doc2OntoProcessor:
                                 entity_chunks[entity] = set()
                             entity_chunks[entity].add(chunk_id)
         
-        print(f"[RAGaaS] Found {len(entity_chunks)} entities to link to chunks")
-        
-        # Create Chunk nodes and MENTIONED_IN relationships
-        count = 0
-        for entity_name, chunk_ids in entity_chunks.items():
-            for chunk_id in chunk_ids:
-                # Create Chunk node and MENTIONED_IN relationship
-                # Match entity by multiple possible name properties
-                # We remove the label constraint (e:Entity) to be safe, 
-                # as Doc2Onto might assign specific class labels.
-                cypher = """
-                MERGE (c:Chunk {id: $chunk_id})
-                ON CREATE SET c.kb_id = $kb_id
-                WITH c
-                MATCH (e)
-                WHERE e.kb_id = $kb_id AND (
-                      e.label_ko = $entity_name 
-                   OR e.label_ko = $entity_name_underscore
-                   OR e.name = $entity_name
-                   OR e.label = $entity_name
-                )
-                MERGE (e)-[:MENTIONED_IN]->(c)
-                """
-                
-                # Doc2Onto uses underscores in some cases
-                entity_name_underscore = entity_name.replace(" ", "_")
-                
-                params = {
-                    "chunk_id": chunk_id,
-                    "kb_id": kb_id,
-                    "entity_name": entity_name,
-                    "entity_name_underscore": entity_name_underscore
-                }
-                
-                try:
-                    # Note: Without a label scan, this might be slow if there are many nodes.
-                    # Ideally we should know the Label used by Doc2Onto (usually 'Entity' or 'OwlThing')
-                    # Adding a hint or fallback if specific label is known would be good.
-                    neo4j_client.execute_query(cypher, parameters=params)
-                    count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to link entity '{entity_name}' to chunk: {e}")
-        
-        print(f"[RAGaaS] Created {count} Entity-Chunk connections in Neo4j")
+        return entity_chunks
 
-    async def _link_entities_to_chunks_fuseki(self, output_dir: str, kb_id: str, doc_id: str):
-        """Create Entity-Chunk connections in Fuseki."""
-        from app.core.fuseki import fuseki_client
+    async def _link_entities_to_chunks_neo4j(self, output_dir: str, kb_id: str, doc_id: str):
+        """Create Entity-Chunk connections in Neo4j (RAGaaS responsibility).
+        
+        Doc2Onto stores entities and triples, but RAGaaS needs to link them
+        to chunks for retrieval purposes.
+        """
+        from app.core.neo4j_client import neo4j_client, Neo4jBatchWriteError
         
         candidates_path = os.path.join(output_dir, "candidates_filtered.jsonl")
         if not os.path.exists(candidates_path):
+            print(f"[RAGaaS] No candidates file for entity-chunk linking")
             return
+        
+        print(f"[RAGaaS] Creating Entity-Chunk connections (Neo4j)...")
+        
+        # Collect entities and their source chunks
+        entity_chunks = self._read_entity_chunks(candidates_path, doc_id)
+        
+        print(f"[RAGaaS] Found {len(entity_chunks)} entities to link to chunks")
 
-        print(f"[RAGaaS] Creating Entity-Chunk connections (Fuseki)...")
+        await neo4j_client.ensure_schema()
         
-        entity_chunks = {}
-        with open(candidates_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip(): continue
-                record = json.loads(line)
-                for triple in record.get("triples", []):
-                    source_chunk_id = triple.get("source_chunk_id", "")
-                    if isinstance(source_chunk_id, str) and '|' in source_chunk_id:
-                        try:
-                            chunk_idx = int(source_chunk_id.split('|')[-1])
-                        except:
-                            chunk_idx = 0
-                    else:
-                        chunk_idx = source_chunk_id if isinstance(source_chunk_id, int) else 0
-                    
-                    chunk_id = f"{doc_id}_{chunk_idx}"
-                    
-                    for entity in [triple.get("subject", ""), triple.get("object", "")]:
-                        if entity:
-                            if entity not in entity_chunks:
-                                entity_chunks[entity] = set()
-                            entity_chunks[entity].add(chunk_id)
-                            
-        # For Fuseki, we use SPARQL Update to insert triples
-        # linking the Entity URI (found by label) to the Chunk ID literal.
-        # Predicate: <http://ragaas.com/schema/mentionedIn>
+        # Create Chunk nodes and MENTIONED_IN relationships, one row per (entity, chunk) pair.
+        # Match entity by name or label_ko. Each branch is anchored on
+        # :Entity + kb_id so it is served by the (kb_id, name) and
+        # (kb_id, label_ko) indexes instead of a full node scan.
+        cypher = """
+        UNWIND $rows AS row
+        MERGE (c:Chunk {id: row.chunk_id})
+        ON CREATE SET c.kb_id = $kb_id
+        WITH c, row
+        CALL {
+            WITH row
+            MATCH (e:Entity {kb_id: $kb_id, name: row.entity_name})
+            RETURN e
+            UNION
+            WITH row
+            MATCH (e:Entity {kb_id: $kb_id})
+            WHERE e.label_ko IN [row.entity_name, row.entity_name_underscore]
+            RETURN e
+        }
+        MERGE (e)-[:MENTIONED_IN]->(c)
+        """
+
+        rows = [
+            {
+                "chunk_id": chunk_id,
+                "entity_name": entity_name,
+                # Doc2Onto uses underscores in some cases
+                "entity_name_underscore": entity_name.replace(" ", "_")
+            }
+            for entity_name, chunk_ids in entity_chunks.items()
+            for chunk_id in sorted(chunk_ids)
+        ]
+
+        try:
+            count = await neo4j_client.execute_batched(cypher, rows, parameters={"kb_id": kb_id})
+        except Neo4jBatchWriteError as e:
+            print(f"[RAGaaS] Created {e.written} Entity-Chunk connections in Neo4j, {len(e.failed_rows)} failed")
+            raise
         
-        count = 0
-        for entity_name, chunk_ids in entity_chunks.items():
-            for chunk_id in chunk_ids:
-                # We try to find the subject ?s that has this label (ko or plain)
-                sparql_update = """
-                PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-                PREFIX ragaas: <http://ragaas.com/schema/>
-                
-                INSERT {
-                    ?s ragaas:mentionedIn ?chunk_id .
-                }
-                WHERE {
-                    ?s rdfs:label ?label .
-                    FILTER(STR(?label) = ?entity_name || STR(?label) = ?entity_name_und)
-                }
-                """
-                
-                # Replace placeholders manually as fuseki_client might not support params in update
-                # Making sure to escape strings safely
-                safe_name = entity_name.replace('"', '\\"')
-                safe_name_und = entity_name.replace(" ", "_").replace('"', '\\"')
-                
-                query = sparql_update.replace("?chunk_id", f'"{chunk_id}"') \
-                                     .replace("?entity_name", f'"{safe_name}"') \
-                                     .replace("?entity_name_und", f'"{safe_name_und}"')
-                
-                try:
-                    # fuseki_client.execute_sparql usually does SELECT, need UPDATE support
-                    # If execute_sparql supports update, good. If not, we might need direct requests.
-                    # Assuming fuseki_client has update capability or we use requests (safe choice)
-                    import requests
-                    from requests.auth import HTTPBasicAuth
-                    
-                    safe_ds_name = f"kb_{kb_id.replace('-', '_')}"
-                    update_url = f"{settings.FUSEKI_URL}/{safe_ds_name}/update"
-                    
-                    requests.post(
-                        update_url, 
-                        data={"update": query},
-                        auth=HTTPBasicAuth("admin", "admin"),
-                        timeout=10
-                    )
-                    count += 1
-                except Exception as e:
-                    print(f"Failed to link entity '{entity_name}' in Fuseki: {e}")
-                    
-        print(f"[RAGaaS] Created {count} Entity-Chunk connections in Fuseki")
+        print(f"[RAGaaS] Created {count} Entity-Chunk connections in Neo4j")
 
     async def _load_to_neo4j_legacy(self, output_dir: str, kb_id: str, doc_id: str):
         """Neo4j loading using APOC for dynamic relationship types."""
-        from app.core.neo4j_client import neo4j_client
+        from app.core.neo4j_client import neo4j_client, Neo4jBatchWriteError
         
         candidates_path = os.path.join(output_dir, "candidates_filtered.jsonl")
         if not os.path.exists(candidates_path):
             print(f"[Doc2Onto] No candidates file found")
             return
         
-        if not neo4j_client.verify_connectivity():
+        if not await neo4j_client.verify_connectivity():
             print(f"[Doc2Onto] Neo4j connection failed. Check credentials.")
             return
         
+        await neo4j_client.ensure_schema()
+
         print(f"[Doc2Onto] Loading triples to Neo4j with dynamic relation types...")
         
         triples = []
@@ -407,10 +371,15 @@ class Doc2OntoProcessor:
                 except json.JSONDecodeError as e:
                     print(f"[Doc2Onto] JSON parse error in candidates file line: {e}")
                     continue
+
+                for triple in record.get("triples", []):
                     if not triple.get("subject") or not triple.get("object"):
                         continue
                     if triple["subject"] == "Unknown" or triple["object"] == "Unknown":
                         continue
+                    # APOC can't create a relationship without a type
+                    if not triple.get("predicate"):
+                        continue
                         
                     triples.append({
                         "subject": triple.get("subject", ""),
@@ -421,7 +390,8 @@ class Doc2OntoProcessor:
         
         print(f"[Doc2Onto] Found {len(triples)} triples to insert")
         
-        count = 0
+        rows = []
+        seen = set()
         for triple in triples:
             source_chunk_id = triple['chunk_id']  # e.g., "debug_squid_game|v1|0000"
             
@@ -438,44 +408,47 @@ class Doc2OntoProcessor:
             # Match Milvus chunk_id format: {doc_id}_{chunk_idx}
             chunk_id = f"{doc_id}_{chunk_idx}"
             
-            # Use APOC to create dynamic relationship type
-            # This allows relation types like "제자", "스승" instead of fixed "RELATION"
-            cypher = """
-            MERGE (s:Entity {name: $subj})
-            ON CREATE SET s.kb_id = $kb_id
-            MERGE (o:Entity {name: $obj})
-            ON CREATE SET o.kb_id = $kb_id
-            WITH s, o
-            CALL apoc.create.relationship(s, $pred, {}, o) YIELD rel
-            WITH s, o
-            MERGE (c:Chunk {id: $chunk_id})
-            ON CREATE SET c.kb_id = $kb_id
-            MERGE (s)-[:MENTIONED_IN]->(c)
-            MERGE (o)-[:MENTIONED_IN]->(c)
-            """
-            
-            params = {
+            key = (triple["subject"], triple["predicate"], triple["object"], chunk_id)
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append({
                 "subj": triple["subject"],
                 "obj": triple["object"],
                 "pred": triple["predicate"],
-                "chunk_id": chunk_id,
-                "kb_id": kb_id
-            }
-            
-            try:
-                neo4j_client.execute_query(cypher, parameters=params)
-                count += 1
-            except Exception as e:
-                print(f"[Doc2Onto] Failed to insert triple: {e}")
+                "chunk_id": chunk_id
+            })
+
+        # Use APOC to merge dynamic relationship types
+        # This allows relation types like "제자", "스승" instead of fixed "RELATION";
+        # merging (not creating) keeps re-ingestion of a document idempotent.
+        cypher = """
+        UNWIND $rows AS row
+        MERGE (s:Entity {kb_id: $kb_id, name: row.subj})
+        MERGE (o:Entity {kb_id: $kb_id, name: row.obj})
+        WITH s, o, row
+        CALL apoc.merge.relationship(s, row.pred, {}, {}, o, {}) YIELD rel
+        WITH s, o, row
+        MERGE (c:Chunk {id: row.chunk_id})
+        ON CREATE SET c.kb_id = $kb_id
+        MERGE (s)-[:MENTIONED_IN]->(c)
+        MERGE (o)-[:MENTIONED_IN]->(c)
+        """
+
+        try:
+            count = await neo4j_client.execute_batched(cypher, rows, parameters={"kb_id": kb_id})
+        except Neo4jBatchWriteError as e:
+            print(f"[Doc2Onto] Inserted {e.written} triples to Neo4j, {len(e.failed_rows)} failed")
+            raise
 
         print(f"[Doc2Onto] Inserted {count} triples to Neo4j")
 
-    async def _load_chunks_to_milvus_adapter(self, jsonl_path: str, kb_id: str, doc_id: str):
+    async def _load_chunks_to_milvus_adapter(self, jsonl_path: str, kb_id: str, doc_id: str, embedding_provider=None):
         print(f"[Doc2Onto] Loading chunks to Milvus for KB: {kb_id}")
         
         try:
             connect_milvus()
-            collection = create_collection(kb_id)
+            collection = get_collection(kb_id, load=False)
         except Exception as e:
             print(f"[Doc2Onto] Failed to connect/create Milvus collection: {e}")
             return
@@ -518,7 +491,7 @@ class Doc2OntoProcessor:
             return
 
         try:
-            embeddings = await embedding_service.get_embeddings(batch_texts)
+            embeddings = await embedding_service.get_embeddings(batch_texts, provider=embedding_provider)
         except Exception as e:
             print(f"[Doc2Onto] Failed to generate embeddings: {e}")
             return
@@ -20,14 +20,25 @@ class EntityStore:
         self.storage_dir = storage_dir
         self.file_path = os.path.join(storage_dir, f"entity_store_{kb_id}.json")
         self.entities: Dict[str, EntityInfo] = {}  # Key: entity text
+        # File version (mtime, size) this instance last loaded or saved
+        self.version: Optional[tuple] = None
         
         # Ensure directory exists
         os.makedirs(storage_dir, exist_ok=True)
         self.load()
 
+    def file_version(self) -> Optional[tuple]:
+        """Version of the store file on disk: (mtime_ns, size), or None if missing."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
     def load(self):
         """Load entities from JSON file."""
-        if not os.path.exists(self.file_path):
+        self.version = self.file_version()
+        if self.version is None:
             return
 
         try:
@@ -39,12 +50,18 @@ class EntityStore:
         except Exception as e:
             logger.error(f"Error loading entity store for KB {self.kb_id}: {e}")
 
+    def reload(self):
+        """Discard in-memory entities and load the file again."""
+        self.entities = {}
+        self.load()
+
     def save(self):
         """Save entities to JSON file."""
         try:
             data = {k: asdict(v) for k, v in self.entities.items()}
             with open(self.file_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            self.version = self.file_version()
             logger.debug(f"Saved entity store for KB {self.kb_id}")
         except Exception as e:
             logger.error(f"Error saving entity store for KB {self.kb_id}: {e}")
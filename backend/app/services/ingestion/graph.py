@@ -1,6 +1,6 @@
 from typing import List, Tuple, Dict, Any
 from pathlib import Path
-from app.services.ingestion.spacy_processor import SpacyGraphProcessor
+from app.services.ingestion.spacy_processor import get_processor
 from openai import AsyncOpenAI
 from app.core.config import settings
 import json
@@ -33,7 +33,7 @@ class GraphProcessor:
         method = graph_settings.get("method", "llm") # Default to LLM
         
         if method == "spacy":
-            processor = SpacyGraphProcessor(kb_id)
+            processor = get_processor(kb_id)
             # Pass merged config or graph_settings? Pass graph_settings
             # Spacy processor currently returns list[str]. 
             # We might need to adjust it later, but for now let's wrap it?
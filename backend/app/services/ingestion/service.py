@@ -1,19 +1,23 @@
+import asyncio
 import io
 from pypdf import PdfReader
 from .text_splitter import chunking_service
 from app.services.embedding import embedding_service
-from app.core.milvus import create_collection
+from app.services.embedding_providers import EmbeddingProviderFactory
+from app.core.milvus import get_collection, normalize_vectors
 from app.models.document import Document, DocumentStatus
 from app.models.knowledge_base import KnowledgeBase
 from app.core.fuseki import fuseki_client
-from app.core.neo4j_client import neo4j_client
+from app.core.neo4j_client import neo4j_client, Neo4jBatchWriteError
 from app.services.ingestion.graph import graph_processor
+from app.services.retrieval.bm25_index import inverted_index_manager
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 
 from app.core.database import SessionLocal, get_db
 from app.services.ingestion.doc2onto import doc2onto_processor
+from app.services.llm_cache import llm_cache
 
 
 class IngestionService:
@@ -33,6 +37,10 @@ class IngestionService:
             async with SessionLocal() as db:
                 result = await db.execute(select(KnowledgeBase).filter(KnowledgeBase.id == kb_id))
                 kb_check = result.scalars().first()
+                embedding_provider = EmbeddingProviderFactory.for_kb(kb_check)
+                metric_type = getattr(kb_check, "metric_type", None) or "COSINE"
+                index_type = getattr(kb_check, "index_type", None)
+                index_params = getattr(kb_check, "index_params", None)
                 if kb_check and kb_check.enable_graph_rag and getattr(kb_check, 'graph_backend', '') in ['neo4j', 'ontology']:
                     use_doc2onto = True
                     graph_backend = getattr(kb_check, 'graph_backend', 'ontology')
@@ -79,11 +87,12 @@ class IngestionService:
                 )
             elif chunking_strategy == "context_aware":
                 if config.get("semantic_mode"):
-                    texts = chunking_service.chunk_semantic(
+                    texts = await chunking_service.chunk_semantic(
                         text,
                         buffer_size=int(config.get("buffer_size", 1)),
                         breakpoint_threshold_type=config.get("breakpoint_type", "percentile"),
-                        breakpoint_threshold_amount=float(config.get("breakpoint_amount", 95.0))
+                        breakpoint_threshold_amount=float(config.get("breakpoint_amount", 95.0)),
+                        embedding_provider=embedding_provider
                     )
                 else:
                     # Convert config headers (e.g. {"h1": true}) to list of tuples
@@ -110,11 +119,17 @@ class IngestionService:
                 # For now, let's raise error to inform user
                 raise ValueError("No text content could be extracted from the document.")
 
-            # Batch embedding if needed, but for now simple
-            vectors = await embedding_service.get_embeddings(texts_to_embed)
+            # Token-budgeted, concurrent batches (see EmbeddingService)
+            vectors = await embedding_service.get_embeddings(texts_to_embed, provider=embedding_provider)
+            if metric_type != "COSINE":
+                # Unit vectors make IP scores equal cosine (see distance_to_cosine)
+                vectors = normalize_vectors(vectors)
 
             # 4. Insert into Milvus
-            collection = create_collection(kb_id)
+            collection = get_collection(
+                kb_id, load=False, metric_type=metric_type, dim=embedding_provider.dimension,
+                index_type=index_type, index_params=index_params
+            )
             
             # Extract metadata
             metadatas = [c["metadata"] for c in chunks if c["content"].strip()]
@@ -130,6 +145,12 @@ class IngestionService:
             collection.insert(data)
             collection.flush() # Ensure data is visible
 
+            # 4.1. Update the persistent BM25 inverted index
+            await asyncio.to_thread(inverted_index_manager.add_chunks, kb_id, doc_id, [
+                {"chunk_id": chunk_id, "content": content}
+                for chunk_id, content in zip(data[1], texts_to_embed)
+            ])
+
             # 4.5. Doc2Onto Graph Ingestion (if enabled)
             # Doc2Onto handles triple extraction and links to RAGaaS chunks
             
@@ -200,6 +221,9 @@ class IngestionService:
                     # Continue without graph - don't fail the entire ingestion
                     
                 finally:
+                    # The graph changed (possibly partially): drop cached graph query generations
+                    llm_cache.invalidate_kb(kb_id)
+
                     # Cleanup temp files
                     if tmp_dir and os.path.exists(tmp_dir):
                         import shutil
@@ -264,7 +288,7 @@ class IngestionService:
         
         if not is_neo4j:
             try:
-                fuseki_client.create_dataset(kb_id)
+                await fuseki_client.create_dataset(kb_id)
             except Exception as e:
                 print(f"Warning: Could not create/verify Fuseki dataset: {e}")
         
@@ -286,7 +310,7 @@ class IngestionService:
                 if not is_neo4j:
                     rdf_triples = graph_result.get("rdf_triples", [])
                     if rdf_triples:
-                        fuseki_client.insert_triples(kb_id, rdf_triples)
+                        await fuseki_client.insert_triples(kb_id, rdf_triples)
                 else:
                     all_triples.extend(triples)
                     
@@ -295,58 +319,59 @@ class IngestionService:
         
         if is_neo4j and all_triples:
             chunk_ids = [f"{doc_id}_{i}" for i in range(len(texts_to_embed))]
+            await neo4j_client.ensure_schema()
             
-            for triple in all_triples:
-                try:
-                    query = """
-                    MERGE (s:Entity {name: $subj})
-                    MERGE (o:Entity {name: $obj})
-                    MERGE (s)-[:RELATION {type: $pred}]->(o)
-                    """
-                    neo4j_client.execute_query(query, {
-                        "subj": triple["subject"],
-                        "obj": triple["object"],
-                        "pred": triple["predicate"]
-                    })
-                except Exception as e:
-                    print(f"Error inserting triple: {e}")
+            # Same graph model as the Doc2Onto loader: dynamic relation types via APOC,
+            # merged so re-ingesting a document doesn't duplicate relationships
+            triple_rows = list({
+                (t["subject"], t["predicate"], t["object"]): {
+                    "subj": t["subject"], "pred": t["predicate"], "obj": t["object"]
+                }
+                for t in all_triples
+                if t.get("subject") and t.get("object") and t.get("predicate")
+            }.values())
+            triple_query = """
+            UNWIND $rows AS row
+            MERGE (s:Entity {kb_id: $kb_id, name: row.subj})
+            MERGE (o:Entity {kb_id: $kb_id, name: row.obj})
+            WITH s, o, row
+            CALL apoc.merge.relationship(s, row.pred, {}, {}, o, {}) YIELD rel
+            RETURN count(rel)
+            """
+            triple_error = None
+            try:
+                inserted = await neo4j_client.execute_batched(triple_query, triple_rows, parameters={"kb_id": kb_id})
+            except Neo4jBatchWriteError as e:
+                # Still link the entities that were written, then report the failure
+                inserted, triple_error = e.written, e
             
-            # Link entities to chunks
+            # Link entities to chunks: one row per (chunk, entity mentioned in it)
+            entity_names = {t[key] for t in all_triples for key in ("subject", "object") if t.get(key)}
+            link_rows = []
             for i, chunk_text in enumerate(texts_to_embed):
-                chunk_id = chunk_ids[i]
                 chunk_text_lower = chunk_text.lower()
-                
-                for triple in all_triples:
-                    subj = triple["subject"]
-                    obj = triple["object"]
-                    
-                    subj_in_chunk = subj.lower() in chunk_text_lower
-                    obj_in_chunk = obj.lower() in chunk_text_lower
-                    
-                    if subj_in_chunk or obj_in_chunk:
-                        try:
-                            link_query = "MERGE (c:Chunk {id: $chunk_id})"
-                            params = {"chunk_id": chunk_id}
-                            
-                            if subj_in_chunk:
-                                link_query += """
-                                WITH c
-                                MATCH (s:Entity {name: $subj})
-                                MERGE (s)-[:MENTIONED_IN]->(c)
-                                """
-                                params["subj"] = subj
-                            if obj_in_chunk:
-                                link_query += """
-                                WITH c
-                                MATCH (o:Entity {name: $obj})
-                                MERGE (o)-[:MENTIONED_IN]->(c)
-                                """
-                                params["obj"] = obj
-                                
-                            neo4j_client.execute_query(link_query, params)
-                        except:
-                            pass
+                for name in entity_names:
+                    if name.lower() in chunk_text_lower:
+                        link_rows.append({"chunk_id": chunk_ids[i], "name": name})
+
+            link_query = """
+            UNWIND $rows AS row
+            MERGE (c:Chunk {id: row.chunk_id})
+            ON CREATE SET c.kb_id = $kb_id
+            WITH c, row
+            MATCH (e:Entity {kb_id: $kb_id, name: row.name})
+            MERGE (e)-[:MENTIONED_IN]->(c)
+            """
+            try:
+                linked = await neo4j_client.execute_batched(link_query, link_rows, parameters={"kb_id": kb_id})
+            except Neo4jBatchWriteError as e:
+                print(f"[Fallback] Inserted {inserted} triples and {e.written} entity-chunk links, {len(e.failed_rows)} links failed")
+                raise
             
+            print(f"[Fallback] Inserted {inserted} triples and {linked} entity-chunk links")
+            if triple_error:
+                print(f"[Fallback] {len(triple_error.failed_rows)} triples failed")
+                raise triple_error
             print(f"[Fallback] Graph ingestion complete for {kb_id}")
 
 ingestion_service = IngestionService()
@@ -2,6 +2,7 @@ import spacy
 from spacy.matcher import PhraseMatcher
 import logging
 from typing import List, Dict, Any, Tuple
+import threading
 import urllib.parse
 import re
 from app.services.ingestion.entity_store import EntityStore
@@ -10,6 +11,28 @@ logger = logging.getLogger(__name__)
 
 _SHARED_NLP = None
 
+# Per-KB processors (warm PhraseMatcher), see get_processor()
+_PROCESSORS: Dict[str, "SpacyGraphProcessor"] = {}
+_PROCESSORS_LOCK = threading.Lock()
+
+
+def get_processor(kb_id: str) -> "SpacyGraphProcessor":
+    """Cached processor for the KB, synced with its entity store file."""
+    with _PROCESSORS_LOCK:
+        processor = _PROCESSORS.get(kb_id)
+        if processor is None:
+            processor = SpacyGraphProcessor(kb_id)
+            _PROCESSORS[kb_id] = processor
+            return processor
+    processor.sync()
+    return processor
+
+
+def drop_processor(kb_id: str):
+    with _PROCESSORS_LOCK:
+        _PROCESSORS.pop(kb_id, None)
+
+
 class SpacyGraphProcessor:
     def __init__(self, kb_id: str, model_name: str = "ko_core_news_sm"):
         self.kb_id = kb_id
@@ -26,7 +49,10 @@ class SpacyGraphProcessor:
         
         self.nlp = _SHARED_NLP
             
+        # Guards the matcher and the entity store (shared by ingestion and query threads)
+        self._lock = threading.RLock()
         self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        self._patterns: Dict[Tuple[str, str], None] = {}  # (label, pattern) already in the matcher
         self.entity_store = EntityStore(kb_id)
         
         # Load known entities into PhraseMatcher
@@ -37,22 +63,62 @@ class SpacyGraphProcessor:
         self.namespace_source = "http://rag.local/source/"
 
     def _refresh_matcher(self):
-        """Reload patterns from EntityStore into PhraseMatcher."""
-        patterns = self.entity_store.get_patterns()
-        self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER") # Reset
-        
-        # Group by label
-        grouped = {}
-        for p in patterns:
-            label = p['label']
-            if label not in grouped:
-                grouped[label] = []
-            grouped[label].append(self.nlp.make_doc(p['pattern']))
-            
-        for label, docs in grouped.items():
-            self.matcher.add(label, docs)
-        
-        logger.info(f"Refreshed PhraseMatcher with {len(patterns)} patterns for KB {self.kb_id}")
+        """Sync PhraseMatcher with the EntityStore's promoted patterns.
+
+        Only patterns not yet in the matcher are added (make_doc is the costly part);
+        the matcher is rebuilt from scratch only if patterns were removed.
+        """
+        with self._lock:
+            current = dict.fromkeys((p['label'], p['pattern']) for p in self.entity_store.get_patterns())
+            if any(key not in current for key in self._patterns):
+                self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER") # Reset
+                self._patterns = {}
+
+            # Group by label
+            grouped = {}
+            for key in current:
+                if key in self._patterns:
+                    continue
+                label, pattern = key
+                if label not in grouped:
+                    grouped[label] = []
+                grouped[label].append(self.nlp.make_doc(pattern))
+                self._patterns[key] = None
+
+            for label, docs in grouped.items():
+                self.matcher.add(label, docs)
+
+            added = sum(len(docs) for docs in grouped.values())
+            if added:
+                logger.info(f"Added {added} patterns to PhraseMatcher ({len(self._patterns)} total) for KB {self.kb_id}")
+
+    def sync(self):
+        """Reload the entity store if its file changed on disk (e.g. another worker) and update the matcher."""
+        if self.entity_store.file_version() == self.entity_store.version:
+            return
+        with self._lock:
+            if self.entity_store.file_version() == self.entity_store.version:
+                return
+            self.entity_store.reload()
+            self._refresh_matcher()
+
+    def find_entities(self, text: str) -> List[str]:
+        """Query-time gazetteer + NER lookup: normalized entity names found in the text."""
+        doc = self.nlp(text)
+        with self._lock:
+            matches = self.matcher(doc)
+
+        entities = []
+        for match_id, start, end in matches:
+            # Apply same normalization as ingestion
+            norm = self._normalize_entity(doc[start:end])
+            if norm:
+                entities.append(norm)
+        for ent in doc.ents:
+            norm = self._normalize_entity(ent)
+            if norm:
+                entities.append(norm)
+        return list(dict.fromkeys(entities))
 
     def _sanitize_uri(self, text: str) -> str:
         """Sanitize text to be used in URI."""
@@ -70,7 +136,8 @@ class SpacyGraphProcessor:
         found_entities = []
         
         # 1. Run PhraseMatcher (Known Entities)
-        matches = self.matcher(doc)
+        with self._lock:
+            matches = self.matcher(doc)
         for match_id, start, end in matches:
             span = doc[start:end]
             label = self.nlp.vocab.strings[match_id]
@@ -98,15 +165,16 @@ class SpacyGraphProcessor:
         candidates = [{"text": e["text"], "label": e["label"]} for e in unique_candidates]
         
         # 3. Update Entity Store
-        self.entity_store.add_candidates(candidates)
-        
-        # 4. Check for promotion
-        if config.get("auto_promote", False):
-            self.entity_store.promote_entities(
-                min_freq=config.get("min_freq", 3),
-                min_len=config.get("min_len", 2)
-            )
-            self._refresh_matcher() 
+        with self._lock:
+            self.entity_store.add_candidates(candidates)
+            
+            # 4. Check for promotion
+            if config.get("auto_promote", False):
+                self.entity_store.promote_entities(
+                    min_freq=config.get("min_freq", 3),
+                    min_len=config.get("min_len", 2)
+                )
+                self._refresh_matcher() 
 
         # 5. Generate Triples
         rdf_triples = []
@@ -1,8 +1,31 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
 from langchain_experimental.text_splitter import SemanticChunker
-from langchain_openai import OpenAIEmbeddings
-from typing import List, Dict
-from app.core.config import settings
+from langchain_core.embeddings import Embeddings
+from typing import List, Dict, Optional
+from app.services.embedding import embedding_service
+from app.services.embedding_providers import EmbeddingProvider
+import asyncio
+
+
+class ServiceEmbeddings(Embeddings):
+    """LangChain adapter that routes SemanticChunker through EmbeddingService.
+
+    SemanticChunker calls the sync embed_* methods, so the splitter runs in a worker
+    thread and submits embedding coroutines back to the event loop that owns the
+    shared embedding provider.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, provider: Optional[EmbeddingProvider] = None):
+        self.loop = loop
+        self.provider = provider
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        future = asyncio.run_coroutine_threadsafe(embedding_service.get_embeddings(texts, provider=self.provider), self.loop)
+        return future.result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
 
 class ChunkingService:
     def __init__(self):
@@ -60,15 +83,16 @@ class ChunkingService:
         docs = markdown_splitter.split_text(text)
         return [doc.page_content for doc in docs]
 
-    def chunk_semantic(self, text: str, buffer_size: int = 1, breakpoint_threshold_type: str = "percentile", breakpoint_threshold_amount: float = 95.0) -> List[str]:
-        embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+    async def chunk_semantic(self, text: str, buffer_size: int = 1, breakpoint_threshold_type: str = "percentile", breakpoint_threshold_amount: float = 95.0, embedding_provider: Optional[EmbeddingProvider] = None) -> List[str]:
+        embeddings = ServiceEmbeddings(asyncio.get_running_loop(), provider=embedding_provider)
         semantic_splitter = SemanticChunker(
             embeddings,
             buffer_size=buffer_size,
             breakpoint_threshold_type=breakpoint_threshold_type,
             breakpoint_threshold_amount=breakpoint_threshold_amount
         )
-        docs = semantic_splitter.create_documents([text])
+        # Run off the event loop: the splitter blocks on embedding results
+        docs = await asyncio.to_thread(semantic_splitter.create_documents, [text])
         return [doc.page_content for doc in docs]
 
     def split_into_sections(self, text: str, section_size: int = 6000, overlap: int = 500) -> List[str]:
@@ -0,0 +1,220 @@
+"""
+Disk-backed cache for deterministic (temperature 0) LLM calls.
+
+Used for graph query analysis, entity extraction and Cypher/SPARQL generation.
+Responses are stored as JSON in SQLite, keyed by a hash of
+(prompt template, model, normalized input, custom prompt, KB graph version),
+with a TTL and least-recently-used eviction beyond max_entries.
+
+KB-scoped entries are invalidated when the KB's graph changes: the KB's graph
+version is bumped (so in-flight calls started before the change are stored
+under an unreachable key) and its rows are dropped.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# kb_id used for entries that don't depend on any KB (e.g. query analysis)
+GLOBAL_SCOPE = ""
+
+
+def normalize_input(text: str) -> str:
+    """NFKC + collapsed whitespace, so near-identical questions share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+class LLMCache:
+    def __init__(self, path: str, max_entries: int = 20000, ttl: int = 604800):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                kb_id TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS kb_graph_versions (
+                kb_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_kb ON llm_responses(kb_id)")
+        self._conn.commit()
+
+    def graph_version(self, kb_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM kb_graph_versions WHERE kb_id = ?", (kb_id,)).fetchone()
+        return row[0] if row else 0
+
+    def make_key(
+        self,
+        template: str,
+        model: str,
+        text: str,
+        custom_prompt: Optional[str] = None,
+        kb_id: str = GLOBAL_SCOPE,
+    ) -> str:
+        version = self.graph_version(kb_id) if kb_id else 0
+        parts = [
+            hashlib.sha256(template.encode("utf-8")).hexdigest(),
+            model,
+            normalize_input(text),
+            custom_prompt or "",
+            kb_id,
+            str(version),
+        ]
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any, kb_id: str = GLOBAL_SCOPE):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, kb_id, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, kb_id, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        """Drop expired rows and least-recently-used rows beyond max_entries (caller holds the lock)."""
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            # Evict a little extra so we don't run this on every insert
+            excess += max(1, self.max_entries // 20)
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE rowid IN (SELECT rowid FROM llm_responses ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+        self._conn.commit()
+
+    def invalidate_kb(self, kb_id: str):
+        """Forget cached responses that depend on the KB's graph."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO kb_graph_versions (kb_id, version) VALUES (?, 1)
+                ON CONFLICT(kb_id) DO UPDATE SET version = version + 1
+                """,
+                (kb_id,)
+            )
+            deleted = self._conn.execute("DELETE FROM llm_responses WHERE kb_id = ?", (kb_id,)).rowcount
+            self._conn.commit()
+        logger.info(f"Invalidated {deleted} cached LLM responses for KB {kb_id}")
+
+    async def cached_call(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        template: str,
+        model: str,
+        text: str,
+        custom_prompt: Optional[str] = None,
+        kb_id: str = GLOBAL_SCOPE,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Return the cached response, or await `call()` and cache it if `cacheable(result)`."""
+        key = await asyncio.to_thread(self.make_key, template, model, text, custom_prompt, kb_id)
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            return cached
+
+        result = await call()
+        if result is not None and (cacheable is None or cacheable(result)):
+            try:
+                await asyncio.to_thread(self.put, key, result, kb_id)
+            except Exception as e:
+                logger.warning(f"Could not cache LLM response: {e}")
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class _DisabledLLMCache:
+    """Stand-in when the cache is off (or cannot be opened): always calls through."""
+
+    def invalidate_kb(self, kb_id: str):
+        pass
+
+    async def cached_call(self, call, *args, **kwargs):
+        return await call()
+
+    def stats(self) -> Dict[str, float]:
+        return {"enabled": False}
+
+
+def _create_llm_cache():
+    if settings.LLM_CACHE_ENABLED:
+        try:
+            return LLMCache(settings.LLM_CACHE_PATH, max_entries=settings.LLM_CACHE_MAX_ENTRIES, ttl=settings.LLM_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"LLM cache disabled: {e}")
+    return _DisabledLLMCache()
+
+
+llm_cache = _create_llm_cache()
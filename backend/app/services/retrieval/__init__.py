@@ -1,5 +1,6 @@
 from .factory import retrieval_factory
 from .reranker import reranking_service
 from .base import RetrievalStrategy
+from .context import RetrievalContext
 
-__all__ = ["retrieval_factory", "reranking_service", "RetrievalStrategy"]
+__all__ = ["retrieval_factory", "reranking_service", "RetrievalStrategy", "RetrievalContext"]
@@ -6,4 +6,9 @@ class RetrievalStrategy(ABC):
     
     @abstractmethod
     async def search(self, kb_id: str, query: str, top_k: int, **kwargs) -> List[Dict[str, Any]]:
+        """Search a Knowledge Base.
+
+        kwargs may carry a request-scoped `context` (RetrievalContext) shared with nested
+        strategies; use RetrievalContext.from_kwargs(kb_id, kwargs) to get or create it.
+        """
         pass
@@ -0,0 +1,405 @@
+"""
+Persistent per-KB inverted index for BM25 keyword scoring.
+
+Replaces the "fetch every chunk from Milvus, tokenize, build BM25Okapi" approach
+used at query time. Postings, document lengths and document frequencies are kept
+per tokenization mode ('strict' and 'extended', see tokenizer.py) and updated
+incrementally on ingestion, chunk edits and document deletion.
+
+Edits are persisted incrementally: each change is appended to a per-KB journal
+(JSON lines next to the snapshot) and replayed on load. The journal is folded
+into a fresh snapshot once it grows past a fraction of the index, so an edit
+costs O(chunk) amortized instead of rewriting the whole index.
+
+Scoring follows rank_bm25.BM25Okapi (k1=1.5, b=0.75, epsilon=0.25) so scores stay
+comparable with the previous implementation, but only the postings of the query
+terms are visited.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from app.services.retrieval.tokenizer import korean_tokenize
+
+logger = logging.getLogger(__name__)
+
+TOKENIZE_MODES = ("strict", "extended")
+
+
+def tokenize_for_index(text: str, mode: str) -> List[str]:
+    """Tokenizer used for both indexing and querying (must stay symmetric)."""
+    return korean_tokenize(text, mode=mode, include_original_words=False, min_length=1)
+
+
+class InvertedIndex:
+    """In-memory inverted index for one Knowledge Base, persisted as JSON."""
+
+    K1 = 1.5
+    B = 0.75
+    EPSILON = 0.25
+
+    # Compact the journal into a snapshot once it holds this many entries
+    # (or 10% of the indexed chunks, whichever is larger)
+    COMPACT_MIN_ENTRIES = 1000
+    COMPACT_RATIO = 0.1
+
+    def __init__(self, kb_id: str, storage_dir: str = "data/bm25_indexes"):
+        self.kb_id = kb_id
+        self.storage_dir = storage_dir
+        self.file_path = os.path.join(storage_dir, f"bm25_index_{kb_id}.json")
+        self.journal_path = os.path.join(storage_dir, f"bm25_index_{kb_id}.journal.jsonl")
+        self._lock = threading.RLock()
+
+        # Changes not yet written (flush) and entries in the on-disk journal
+        self._pending: List[dict] = []
+        self._journal_entries = 0
+
+        # chunk_id -> doc_id
+        self.chunk_docs: Dict[str, str] = {}
+        # mode -> chunk_id -> {term: tf}  (source of truth, persisted)
+        self.doc_terms: Dict[str, Dict[str, Dict[str, int]]] = {m: {} for m in TOKENIZE_MODES}
+        # Derived structures (rebuilt on load)
+        self.postings: Dict[str, Dict[str, Dict[str, int]]] = {m: {} for m in TOKENIZE_MODES}
+        self.doc_len: Dict[str, Dict[str, int]] = {m: {} for m in TOKENIZE_MODES}
+        self.total_len: Dict[str, int] = {m: 0 for m in TOKENIZE_MODES}
+        self._avg_idf: Dict[str, Optional[float]] = {m: None for m in TOKENIZE_MODES}
+
+        os.makedirs(storage_dir, exist_ok=True)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    def __len__(self) -> int:
+        return len(self.chunk_docs)
+
+    def load(self) -> bool:
+        """Load the index from disk. Returns False if no index file exists."""
+        if not self.exists:
+            return False
+
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading BM25 index for KB {self.kb_id}: {e}")
+            return False
+
+        with self._lock:
+            self._reset()
+            self.chunk_docs = data.get("chunk_docs", {})
+            for mode in TOKENIZE_MODES:
+                for chunk_id, terms in data.get("doc_terms", {}).get(mode, {}).items():
+                    self._add_terms(mode, chunk_id, terms)
+            self._replay_journal()
+        logger.info(f"Loaded BM25 index with {len(self.chunk_docs)} chunks for KB {self.kb_id}")
+        return True
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        truncated = False
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A write cut short by a crash; everything before it is intact. Compact
+                    # right away so new entries aren't appended after the broken line.
+                    logger.warning(f"Ignoring truncated BM25 journal entry {line_no} for KB {self.kb_id}")
+                    truncated = True
+                    break
+                self._apply(entry)
+                self._journal_entries += 1
+        if truncated:
+            self.save()
+
+    def flush(self):
+        """Persist pending changes: append them to the journal, or compact if it grew too large."""
+        with self._lock:
+            if not self._pending:
+                return
+            threshold = max(self.COMPACT_MIN_ENTRIES, int(len(self.chunk_docs) * self.COMPACT_RATIO))
+            if self._journal_entries + len(self._pending) > threshold:
+                self.save()
+                return
+            try:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self._pending))
+                self._journal_entries += len(self._pending)
+                self._pending = []
+            except Exception as e:
+                logger.error(f"Error writing BM25 journal for KB {self.kb_id}: {e}")
+
+    def save(self):
+        """Atomically write a full snapshot of the index and clear the journal."""
+        with self._lock:
+            data = {
+                "version": 1,
+                "chunk_docs": self.chunk_docs,
+                "doc_terms": self.doc_terms,
+            }
+            tmp_path = f"{self.file_path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.file_path)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self._journal_entries = 0
+                self._pending = []
+            except Exception as e:
+                logger.error(f"Error saving BM25 index for KB {self.kb_id}: {e}")
+
+    def delete_file(self):
+        with self._lock:
+            self._reset()
+            for path in (self.file_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _reset(self):
+        self.chunk_docs = {}
+        self._pending = []
+        self._journal_entries = 0
+        for mode in TOKENIZE_MODES:
+            self.doc_terms[mode] = {}
+            self.postings[mode] = {}
+            self.doc_len[mode] = {}
+            self.total_len[mode] = 0
+            self._avg_idf[mode] = None
+
+    # --- Mutation ---
+
+    def _add_terms(self, mode: str, chunk_id: str, terms: Dict[str, int]):
+        self.doc_terms[mode][chunk_id] = terms
+        length = sum(terms.values())
+        self.doc_len[mode][chunk_id] = length
+        self.total_len[mode] += length
+        postings = self.postings[mode]
+        for term, tf in terms.items():
+            postings.setdefault(term, {})[chunk_id] = tf
+        self._avg_idf[mode] = None
+
+    def _remove_terms(self, mode: str, chunk_id: str):
+        terms = self.doc_terms[mode].pop(chunk_id, None)
+        if terms is None:
+            return
+        self.total_len[mode] -= self.doc_len[mode].pop(chunk_id, 0)
+        postings = self.postings[mode]
+        for term in terms:
+            plist = postings.get(term)
+            if plist is None:
+                continue
+            plist.pop(chunk_id, None)
+            if not plist:
+                del postings[term]
+        self._avg_idf[mode] = None
+
+    def _apply(self, entry: dict) -> bool:
+        """Apply one journal entry to the in-memory index. Returns False if it was a no-op."""
+        chunk_id = entry["chunk_id"]
+        existed = chunk_id in self.chunk_docs
+        if existed:
+            del self.chunk_docs[chunk_id]
+            for mode in TOKENIZE_MODES:
+                self._remove_terms(mode, chunk_id)
+        if entry["op"] == "add":
+            self.chunk_docs[chunk_id] = entry["doc_id"]
+            for mode in TOKENIZE_MODES:
+                self._add_terms(mode, chunk_id, entry["terms"].get(mode, {}))
+            return True
+        return existed
+
+    def add_chunk(self, chunk_id: str, doc_id: str, content: str):
+        """Insert or replace a chunk (tokenizes with every mode). Call flush() to persist."""
+        terms = {mode: dict(Counter(tokenize_for_index(content or "", mode))) for mode in TOKENIZE_MODES}
+        entry = {"op": "add", "chunk_id": chunk_id, "doc_id": doc_id, "terms": terms}
+        with self._lock:
+            self._apply(entry)
+            self._pending.append(entry)
+
+    def remove_chunk(self, chunk_id: str):
+        entry = {"op": "remove", "chunk_id": chunk_id}
+        with self._lock:
+            if self._apply(entry):
+                self._pending.append(entry)
+
+    def remove_document(self, doc_id: str) -> int:
+        with self._lock:
+            chunk_ids = [cid for cid, did in self.chunk_docs.items() if did == doc_id]
+            for cid in chunk_ids:
+                self.remove_chunk(cid)
+            return len(chunk_ids)
+
+    # --- Scoring ---
+
+    def _idf(self, mode: str, df: int) -> float:
+        n = len(self.chunk_docs)
+        idf = math.log(n - df + 0.5) - math.log(df + 0.5)
+        if idf < 0:
+            return self.EPSILON * self._average_idf(mode)
+        return idf
+
+    def _average_idf(self, mode: str) -> float:
+        """Mean idf over the vocabulary (BM25Okapi's floor for negative idf).
+
+        Cached until the next mutation, so it is computed at most once per change.
+        """
+        cached = self._avg_idf[mode]
+        if cached is not None:
+            return cached
+        n = len(self.chunk_docs)
+        postings = self.postings[mode]
+        if not postings:
+            avg = 0.0
+        else:
+            idf_sum = sum(math.log(n - len(p) + 0.5) - math.log(len(p) + 0.5) for p in postings.values())
+            avg = idf_sum / len(postings)
+        self._avg_idf[mode] = avg
+        return avg
+
+    def score(self, query_tokens: Iterable[str], mode: str = "strict") -> Dict[str, float]:
+        """BM25 scores for every chunk containing at least one query term.
+
+        Cost is proportional to the postings of the query terms, not the corpus size.
+        """
+        scores: Dict[str, float] = {}
+        with self._lock:
+            n = len(self.chunk_docs)
+            if n == 0:
+                return scores
+            avgdl = self.total_len[mode] / n or 1.0
+            postings = self.postings[mode]
+            doc_len = self.doc_len[mode]
+            k1, b = self.K1, self.B
+
+            for term in query_tokens:
+                plist = postings.get(term)
+                if not plist:
+                    continue
+                idf = self._idf(mode, len(plist))
+                for chunk_id, tf in plist.items():
+                    denom = tf + k1 * (1 - b + b * doc_len[chunk_id] / avgdl)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * (tf * (k1 + 1) / denom)
+        return scores
+
+
+class InvertedIndexManager:
+    """Process-wide registry of per-KB inverted indexes."""
+
+    def __init__(self, storage_dir: str = "data/bm25_indexes"):
+        self.storage_dir = storage_dir
+        self._indexes: Dict[str, InvertedIndex] = {}
+        # Guards the registry only; loading/bootstrapping holds a per-KB lock so a
+        # slow bootstrap never blocks other KBs
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, kb_id: str) -> InvertedIndex:
+        """Return the index for a KB, loading it from disk or bootstrapping it from Milvus.
+
+        Blocking (disk/Milvus I/O); call it from a worker thread in async code.
+        Raises if the bootstrap fails; nothing is cached then, so the next call retries.
+        """
+        with self._lock:
+            index = self._indexes.get(kb_id)
+            if index is not None:
+                return index
+            load_lock = self._load_locks.setdefault(kb_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                index = self._indexes.get(kb_id)
+            if index is not None:
+                return index
+            index = InvertedIndex(kb_id, storage_dir=self.storage_dir)
+            if not index.load():
+                self._bootstrap_from_milvus(index)
+            with self._lock:
+                self._indexes[kb_id] = index
+            return index
+
+    def _bootstrap_from_milvus(self, index: InvertedIndex):
+        """Build an index for a KB that was ingested before the index existed.
+
+        Only a complete build is saved; any error is re-raised.
+        """
+        from app.core.milvus import get_collection
+
+        print(f"[BM25Index] No index for KB {index.kb_id}. Building from Milvus...")
+        iterator = None
+        try:
+            collection = get_collection(index.kb_id)
+            iterator = collection.query_iterator(
+                batch_size=1000,
+                expr="chunk_id != ''",
+                output_fields=["content", "doc_id", "chunk_id"]
+            )
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                for hit in batch:
+                    index.add_chunk(hit.get("chunk_id"), hit.get("doc_id"), hit.get("content", ""))
+        except Exception as e:
+            logger.error(f"Failed to bootstrap BM25 index for KB {index.kb_id}: {e}")
+            raise
+        finally:
+            if iterator is not None:
+                try:
+                    iterator.close()
+                except Exception:
+                    pass
+        index.save()
+        print(f"[BM25Index] Built index with {len(index)} chunks for KB {index.kb_id}")
+
+    def _get_for_update(self, kb_id: str) -> Optional[InvertedIndex]:
+        """Index to mutate, or None if it can't be loaded/bootstrapped right now.
+
+        Skipping the update is safe: the chunks are already in Milvus, so the next
+        successful bootstrap picks them up.
+        """
+        try:
+            return self.get(kb_id)
+        except Exception as e:
+            logger.warning(f"BM25 index for KB {kb_id} unavailable, skipping update: {e}")
+            return None
+
+    # The update methods tokenize and write to disk: call them via asyncio.to_thread.
+
+    def add_chunks(self, kb_id: str, doc_id: str, chunks: List[Dict[str, str]]):
+        """Index chunks of a document. chunks: [{"chunk_id": ..., "content": ...}]"""
+        index = self._get_for_update(kb_id)
+        if index is None:
+            return
+        for chunk in chunks:
+            index.add_chunk(chunk["chunk_id"], doc_id, chunk["content"])
+        index.flush()
+
+    def update_chunk(self, kb_id: str, doc_id: str, chunk_id: str, content: str):
+        index = self._get_for_update(kb_id)
+        if index is None:
+            return
+        index.add_chunk(chunk_id, doc_id, content)
+        index.flush()
+
+    def remove_document(self, kb_id: str, doc_id: str):
+        index = self._get_for_update(kb_id)
+        if index is not None and index.remove_document(doc_id):
+            index.flush()
+
+    def drop(self, kb_id: str):
+        """Forget and delete the index of a deleted KB."""
+        with self._lock:
+            index = self._indexes.pop(kb_id, None) or InvertedIndex(kb_id, storage_dir=self.storage_dir)
+            self._load_locks.pop(kb_id, None)
+        index.delete_file()
+
+
+inverted_index_manager = InvertedIndexManager()
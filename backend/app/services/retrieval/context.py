@@ -0,0 +1,171 @@
+"""
+Request-scoped retrieval context.
+
+One API request can run several strategies (e.g. hybrid -> graph -> graph fallback
+-> hybrid again). The context carries what they would otherwise each recompute:
+KB configuration, query embeddings, query tokens, BM25 scores, fetched chunks and
+a timing trace. Strategies get it with `RetrievalContext.from_kwargs(kb_id, kwargs)`
+and pass it on as `context=...` to nested strategies.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.milvus import get_collection
+from app.services.embedding import embedding_service
+
+
+@dataclass
+class RetrievalContext:
+    kb_id: str
+    metric_type: str = "COSINE"
+    embedding_provider: Any = None
+    ann_search_params: Optional[dict] = None
+    kb: Any = None
+
+    # Per-request memoization
+    _embeddings: Dict[str, asyncio.Future] = field(default_factory=dict, repr=False)
+    _tokens: Dict[Tuple[str, str], List[str]] = field(default_factory=dict, repr=False)
+    _llm_keywords: Dict[str, str] = field(default_factory=dict, repr=False)
+    _bm25_scores: Dict[Tuple[Tuple[str, ...], str], Dict[str, float]] = field(default_factory=dict, repr=False)
+    # chunk_id -> row ({chunk_id, doc_id, content[, vector]}) fetched during this request
+    chunks: Dict[str, Dict[str, Any]] = field(default_factory=dict, repr=False)
+
+    # Timing trace: (stage, start offset in s, duration in s)
+    started_at: float = field(default_factory=time.perf_counter, repr=False)
+    timings: List[Tuple[str, float, float]] = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_kwargs(cls, kb_id: str, kwargs: Dict[str, Any]) -> "RetrievalContext":
+        """Context passed by the caller, or a new one built from the search kwargs."""
+        context = kwargs.get("context")
+        if context is None:
+            context = cls(
+                kb_id=kb_id,
+                metric_type=kwargs.get("metric_type", "COSINE"),
+                embedding_provider=kwargs.get("embedding_provider"),
+                ann_search_params=kwargs.get("ann_search_params"),
+            )
+            kwargs["context"] = context
+        return context
+
+    # --- Timing ---
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.timings.append((stage, start - self.started_at, end - start))
+
+    def timing_summary(self) -> str:
+        return ", ".join(f"{stage}={duration * 1000:.0f}ms" for stage, _, duration in self.timings)
+
+    # --- Query embedding / tokens ---
+
+    def _embedding_future(self, query: str) -> asyncio.Future:
+        future = self._embeddings.get(query)
+        if future is None:
+            future = asyncio.ensure_future(
+                embedding_service.get_query_embedding(query, provider=self.embedding_provider)
+            )
+            # Mark a failure as retrieved; waiters still see it
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._embeddings[query] = future
+        return future
+
+    def prefetch_query_embedding(self, query: str) -> None:
+        """Start embedding the query in the background; await it later with get_query_embedding."""
+        self._embedding_future(query)
+
+    async def get_query_embedding(self, query: str) -> List[float]:
+        """Query embedding, computed once per request (concurrent callers share the call)."""
+        return await asyncio.shield(self._embedding_future(query))
+
+    async def tokenize(self, query: str, mode: str) -> List[str]:
+        from .bm25_index import tokenize_for_index
+
+        key = (query, mode)
+        if key not in self._tokens:
+            # Kiwi is CPU-bound; keep it off the event loop
+            self._tokens[key] = await asyncio.to_thread(tokenize_for_index, query, mode)
+        return self._tokens[key]
+
+    async def extract_keywords_with_llm(self, query: str) -> str:
+        if query not in self._llm_keywords:
+            from .keyword import KeywordRetrievalStrategy
+            self._llm_keywords[query] = await KeywordRetrievalStrategy().extract_keywords_with_llm(query)
+        return self._llm_keywords[query]
+
+    # --- BM25 ---
+
+    async def bm25_scores(self, tokens: List[str], mode: str) -> Dict[str, float]:
+        """BM25 scores over the KB's inverted index (first use may bootstrap it from Milvus)."""
+        from .bm25_index import inverted_index_manager
+
+        key = (tuple(tokens), mode)
+        if key not in self._bm25_scores:
+            def score():
+                return inverted_index_manager.get(self.kb_id).score(tokens, mode=mode)
+            try:
+                self._bm25_scores[key] = await asyncio.to_thread(score)
+            except Exception as e:
+                # Index bootstrap failed (e.g. Milvus down); it is retried on the next call
+                print(f"[BM25Index] Index unavailable for KB {self.kb_id}: {e}")
+                return {}
+        return self._bm25_scores[key]
+
+    # --- Chunks ---
+
+    async def fetch_chunks(self, chunk_ids: List[str], with_vector: bool = False) -> Dict[str, Dict[str, Any]]:
+        """chunk_id -> row for the given ids, querying Milvus only for ids not fetched yet."""
+        missing = [
+            cid for cid in dict.fromkeys(chunk_ids)
+            if cid not in self.chunks or (with_vector and "vector" not in self.chunks[cid])
+        ]
+        if missing:
+            output_fields = ["content", "doc_id", "chunk_id"] + (["vector"] if with_vector else [])
+
+            def fetch():
+                collection = get_collection(self.kb_id)
+                return collection.query(
+                    expr=f'chunk_id in {json.dumps(missing)}',
+                    output_fields=output_fields,
+                    limit=len(missing)
+                )
+
+            with self.timed("milvus_fetch"):
+                rows = await asyncio.to_thread(fetch)
+            for row in rows:
+                self.chunks.setdefault(row["chunk_id"], {}).update(row)
+        return {cid: self.chunks[cid] for cid in chunk_ids if cid in self.chunks}
+
+    async def get_chunk_vectors(self, results: List[Dict[str, Any]]) -> List[List[float]]:
+        """Stored vectors for result dicts, aligned with `results`.
+
+        Uses a vector carried on the result, else one batched Milvus fetch by chunk_id.
+        Only results that have neither (e.g. no chunk_id) get their content embedded.
+        """
+        vectors: List[Optional[List[float]]] = [r.get("vector") for r in results]
+        ids = [r.get("chunk_id") for r, v in zip(results, vectors) if v is None and r.get("chunk_id")]
+        if ids:
+            rows = await self.fetch_chunks(ids, with_vector=True)
+            for i, result in enumerate(results):
+                if vectors[i] is None and result.get("chunk_id") in rows:
+                    vectors[i] = rows[result["chunk_id"]].get("vector")
+
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            with self.timed("embed_missing_chunks"):
+                embedded = await embedding_service.get_embeddings(
+                    [results[i]["content"] for i in missing], provider=self.embedding_provider
+                )
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
@@ -0,0 +1,212 @@
+"""
+Shared cross-encoder used by the reranker and the 2-stage strategy.
+
+One model instance per process, loaded (and warmed up) at startup. Inference runs
+in a dedicated thread pool so it never blocks the event loop. Supports the
+PyTorch and ONNX Runtime backends and optional int8 dynamic quantization
+(PyTorch backend) for CPU-only hosts.
+
+Concurrent requests are micro-batched: each predict() call enqueues its pairs,
+and a batch worker collects the queue for a few milliseconds (or until the pair
+limit), runs one forward pass and hands each caller its slice of the scores.
+
+score() puts an LRU score cache in front of predict(), keyed by (model, normalized
+query, chunk content hash), so re-running the same question only scores new chunks.
+"""
+
+from app.core.config import settings
+from .score_cache import ScoreCache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderService:
+    def __init__(self):
+        self.model_name = settings.RERANKER_MODEL
+        self.backend = settings.RERANKER_BACKEND.lower()
+        self.quantize = (settings.RERANKER_QUANTIZE or "none").lower()
+        self.batch_size = settings.RERANKER_BATCH_SIZE
+        self.max_length = settings.RERANKER_MAX_LENGTH
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._executor = None
+        self.score_cache = ScoreCache(settings.RERANKER_SCORE_CACHE_SIZE)
+
+        # Micro-batching queue and workers (bound to the event loop that created them)
+        self._queue: Optional[asyncio.Queue] = None
+        self._queue_loop = None
+        self._workers: List[asyncio.Task] = []
+        self.batches = 0
+        self.batched_pairs = 0
+        self.batched_requests = 0
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the scoring model + numeric backend (scores differ slightly between them)."""
+        return f"{self.model_name}:{self.backend}:{self.quantize}"
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.RERANKER_WORKERS,
+                thread_name_prefix="cross-encoder"
+            )
+        return self._executor
+
+    def _get_model(self):
+        """Lazy-load the model (thread-safe)."""
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is not None:
+                return self._model
+
+            from sentence_transformers import CrossEncoder  # type: ignore
+
+            logger.info(f"Loading cross-encoder: {self.model_name} (backend={self.backend}, quantize={self.quantize})")
+            if self.backend == "onnx":
+                model_kwargs = {}
+                if settings.RERANKER_ONNX_FILE:
+                    # e.g. a pre-quantized "onnx/model_qint8_avx2.onnx"
+                    model_kwargs["file_name"] = settings.RERANKER_ONNX_FILE
+                model = CrossEncoder(
+                    self.model_name, device="cpu", max_length=self.max_length,
+                    backend="onnx", model_kwargs=model_kwargs
+                )
+            else:
+                model = CrossEncoder(self.model_name, max_length=self.max_length)
+                if self.quantize == "int8":
+                    import torch
+                    model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+            self._model = model
+        return self._model
+
+    def _predict(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        model = self._get_model()
+        # Length-sorted so each model batch pads to similar lengths
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        scores = model.predict(
+            [list(pairs[i]) for i in order],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        results = [0.0] * len(pairs)
+        for i, score in zip(order, scores):
+            results[i] = float(score)
+        return results
+
+    async def _run(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._predict, pairs)
+
+    async def predict(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Raw cross-encoder scores (logits) for (query, passage) pairs."""
+        if not pairs:
+            return []
+        if not settings.RERANKER_MICROBATCH_ENABLED:
+            return await self._run(list(pairs))
+
+        loop = asyncio.get_running_loop()
+        if self._queue_loop is not loop:
+            self._queue = asyncio.Queue()
+            self._queue_loop = loop
+            self._workers = [loop.create_task(self._batch_worker(self._queue)) for _ in range(settings.RERANKER_WORKERS)]
+
+        future = loop.create_future()
+        self._queue.put_nowait((list(pairs), future))
+        return await future
+
+    async def score(self, query: str, contents: Sequence[str]) -> List[float]:
+        """Raw scores for (query, content) pairs; only cache misses are sent to the model."""
+        scores = self.score_cache.get_many(self.model_id, query, contents)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            # Duplicate contents within one call are scored once
+            missing_contents = list(dict.fromkeys(contents[i] for i in missing))
+            new_scores = await self.predict([(query, content) for content in missing_contents])
+            self.score_cache.put_many(self.model_id, query, missing_contents, new_scores)
+            by_content = dict(zip(missing_contents, new_scores))
+            for i in missing:
+                scores[i] = by_content[contents[i]]
+        return scores
+
+    async def _batch_worker(self, queue: asyncio.Queue):
+        max_pairs = settings.RERANKER_MICROBATCH_MAX_PAIRS
+        max_wait = settings.RERANKER_MICROBATCH_MAX_WAIT_MS / 1000
+
+        def drain(batch, size):
+            while size < max_pairs and not queue.empty():
+                item = queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+            return size
+
+        while True:
+            batch = [await queue.get()]
+            size = drain(batch, len(batch[0][0]))
+            if size < max_pairs and max_wait > 0:
+                # Give concurrent requests a moment to join this batch
+                await asyncio.sleep(max_wait)
+                size = drain(batch, size)
+
+            # Requests whose caller went away (e.g. timed out) are skipped
+            batch = [(pairs, future) for pairs, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            all_pairs = [pair for pairs, _ in batch for pair in pairs]
+            try:
+                scores = await self._run(all_pairs)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_pairs += len(all_pairs)
+            self.batched_requests += len(batch)
+
+            offset = 0
+            for pairs, future in batch:
+                if not future.done():
+                    future.set_result(scores[offset:offset + len(pairs)])
+                offset += len(pairs)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_id,
+            "loaded": self._model is not None,
+            "batches": self.batches,
+            "avg_batch_pairs": self.batched_pairs / self.batches if self.batches else 0.0,
+            "avg_batch_requests": self.batched_requests / self.batches if self.batches else 0.0,
+            "score_cache": self.score_cache.stats(),
+        }
+
+    async def warmup(self):
+        """Load the model and run one forward pass, so the first request doesn't pay for it."""
+        try:
+            await self.predict([("warmup", "warmup")])
+            logger.info(f"Cross-encoder ready: {self.model_id}")
+        except Exception as e:
+            logger.error(f"Cross-encoder warmup failed: {e}")
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._queue = None
+        self._queue_loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+cross_encoder_service = CrossEncoderService()
@@ -1,7 +1,7 @@
 import os
 import json
-import requests
 from typing import Optional, Dict
+from app.core.http_client import get_http_client
 
 class CypherGenerator:
     """자연어 질문을 Neo4j Cypher 쿼리로 변환하는 LLM 기반 생성기"""
@@ -36,6 +36,8 @@ class CypherGenerator:
    (예: `MATCH (n:Entity {name: "성기훈"})-[:`MENTIONED_IN`]->(c:Chunk) RETURN c.text`)
 6. 결과 형식: `RETURN` 구문을 사용하며, 변수명은 질문의 의도를 잘 반영하도록 지정하세요 (예: n.name AS answer).
 7. 결과 정제: 가능한 중복을 제거하기 위해 `DISTINCT`를 사용하거나 리스트로 수집(`collect`)하세요.
+8. 인덱스 활용: 시작 노드에는 항상 라벨과 `kb_id: $kb_id` 파라미터를 지정하세요. 라벨 없는 `MATCH (n)`는 전체 노드 스캔이 되므로 사용하지 마세요.
+   (예: `MATCH (n:Entity {kb_id: $kb_id, name: "성기훈"})`)
 
 반드시 아래 JSON 형식으로만 응답하세요:
 ```json
@@ -82,7 +84,7 @@ class CypherGenerator:
             # RAGaaS 실행 환경에서 OPENAI_API_KEY가 없을 경우 대비
             pass
 
-    def generate(self, question: str, context: Optional[str] = None, mode: str = "graph", custom_prompt: Optional[str] = None, inverse_search_mode: str = "auto") -> Dict:
+    async def generate(self, question: str, context: Optional[str] = None, mode: str = "graph", custom_prompt: Optional[str] = None, inverse_search_mode: str = "auto") -> Dict:
         """사용자 질문을 Cypher로 변환
         
         Args:
@@ -138,11 +140,11 @@ class CypherGenerator:
         }
 
         try:
-            response = requests.post(
+            # Shared pooled client: waiting on the LLM doesn't block the event loop
+            response = await get_http_client("llm").post(
                 self.llm_endpoint,
                 headers=headers,
                 json=payload,
-                timeout=60,
             )
             response.raise_for_status()
             
@@ -166,9 +168,10 @@ class CypherGenerator:
 
 # 사용 예시
 if __name__ == "__main__":
+    import asyncio
     generator = CypherGenerator()
     q = "성기훈의 스승의 스승은 누구야?"
-    result = generator.generate(q)
+    result = asyncio.run(generator.generate(q))
     print(f"Question: {q}")
     print(f"Thought: {result.get('thought')}")
     print(f"Cypher:\n{result.get('cypher')}")
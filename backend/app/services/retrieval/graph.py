@@ -4,17 +4,49 @@ from .graph_backends import GraphBackendFactory
 from app.core.fuseki import fuseki_client
 from app.core.neo4j_client import neo4j_client
 from app.core.config import settings
-from app.core.milvus import create_collection
+from .context import RetrievalContext
+from app.services.llm_cache import llm_cache
 from openai import AsyncOpenAI
+import asyncio
 import json
 import logging
 import re
 import urllib.parse
-from app.services.embedding import embedding_service
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+ENTITY_EXTRACTION_SYSTEM_PROMPT = "You are a precise entity extractor for Knowledge Graphs. Output JSON only."
+ENTITY_EXTRACTION_PROMPT = """
+        Extract key entities (subjects, objects, concepts, proper nouns) from the search query.
+        Include specific terms that might be nodes in a knowledge graph.
+        Don't be too generic (e.g., avoid "technology" if a specific name is implied, but include "1인자" or "Master" if present).
+        
+        Query: {query}
+        
+        Output format: {{"entities": ["Elon Musk", "SpaceX", "CEO"]}}
+        """
+
+QUERY_ANALYSIS_SYSTEM_PROMPT = "You are a query analyzer for graph search. Be precise and output only JSON."
+QUERY_ANALYSIS_PROMPT = """
+            Analyze this search query and extract:
+            1. The main subject/entity being asked about
+            2. The type of relationship being queried (if any)
+            3. Whether it's a multi-hop query (e.g., "A's B's C")
+            4. Potential alternative entity names or aliases
+            
+            Query: {query}
+            
+            Output format:
+            {{
+                "subject": "main entity name",
+                "relationship_type": "master/student/creator/etc or null",
+                "is_multi_hop": true/false,
+                "hop_count": 1 or 2 or 3,
+                "alternatives": ["alternative names or related entities"]
+            }}
+            """
+
 class GraphRetrievalStrategy(RetrievalStrategy):
     def __init__(self):
         self.namespace_entity = "http://rag.local/entity/"
@@ -23,6 +55,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
 
     async def search(self, kb_id: str, query: str, top_k: int, **kwargs) -> List[Dict[str, Any]]:
         use_raw_log = kwargs.get("use_raw_log", False)
+        context = RetrievalContext.from_kwargs(kb_id, kwargs)
         trace_logs = []
         
         import time
@@ -53,19 +86,40 @@ class GraphRetrievalStrategy(RetrievalStrategy):
             if use_raw_log:
                 trace_logs.append(formatted_msg)
 
+        # Pipeline stage timings: name -> (start ms, end ms) relative to start_time
+        stage_times: Dict[str, tuple] = {}
+
+        async def stage(name: str, coro):
+            stage_start = time.time()
+            try:
+                with context.timed(f"graph_{name}"):
+                    return await coro
+            finally:
+                stage_times[name] = (int((stage_start - start_time) * 1000), int((time.time() - start_time) * 1000))
+
         log(f"Graph Search Start for query: {query}")
         
-        # 1. Analyze query for semantic understanding
-        query_analysis = await self._analyze_query(query)
-        log(f"DEBUG: Query analysis: {query_analysis}")
-        
-        # 2. Extract Entities from Query
-        entities = await self._extract_entities(kb_id, query)
-        log(f"DEBUG: Extracted entities: {entities}")
-        
-        # 3. Expand entities - find related entities in graph
-        expanded_entities = await self._expand_entities(kb_id, entities)
-        log(f"DEBUG: Expanded entities: {expanded_entities}")
+        # Dependency-aware pipeline:
+        #   t=0: query analysis (LLM) | entity extraction (LLM + spaCy) | query embedding
+        #   entities -> expansion (SPARQL); analysis + expansion -> graph backend query
+        # The embedding is only awaited later, when graph chunks are scored.
+        context.prefetch_query_embedding(query)
+        analysis_task = asyncio.ensure_future(stage("analyze_query", self._analyze_query(query)))
+        try:
+            # 2. Extract Entities from Query
+            entities = await stage("extract_entities", self._extract_entities(kb_id, query))
+            log(f"DEBUG: Extracted entities: {entities}")
+            
+            # 3. Expand entities - find related entities in graph (overlaps with a still-running analysis)
+            expanded_entities = await stage("expand_entities", self._expand_entities(kb_id, entities))
+            log(f"DEBUG: Expanded entities: {expanded_entities}")
+            
+            # 1. Analyze query for semantic understanding (started at t=0)
+            query_analysis = await analysis_task
+            log(f"DEBUG: Query analysis: {query_analysis}")
+        finally:
+            if not analysis_task.done():
+                analysis_task.cancel()
         
         all_entities = list(set(entities + expanded_entities))
         
@@ -88,8 +142,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         backend = GraphBackendFactory.get_backend(graph_backend_type)
         
         # Execute query via backend strategy
-        # Execute query via backend strategy
-        graph_result = await backend.query(
+        graph_result = await stage("graph_query", backend.query(
             kb_id=kb_id,
             entities=all_entities,
             hops=graph_hops,
@@ -97,7 +150,8 @@ class GraphRetrievalStrategy(RetrievalStrategy):
             relationship_keywords=query_analysis.get("relationship_keywords", []),
             query_text=query,
             **kwargs
-        )
+        ))
+        log(f"DEBUG: {self._critical_path(stage_times)}")
         
         # Safely get chunk_ids allowing default empty list if key missing
         chunk_ids = graph_result.get("chunk_ids", [])
@@ -108,7 +162,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         # 5. Fetch content from Milvus
         results = []
         if chunk_ids:
-            results = await self._fetch_chunks(kb_id, chunk_ids, query, top_k)
+            results = await stage("fetch_chunks", self._fetch_chunks(kb_id, chunk_ids, query, top_k, context))
         
         # 6. Graph-Guided Fallback: If SPARQL found entities but no chunks, or if no results at all
         # We use the entities found by SPARQL (e.g. 'Duke', 'Oh Il-nam') to guide the vector/hybrid search
@@ -121,7 +175,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
             
         if not results or (len(results) == 1 and results[0].get("chunk_id") == "GRAPH_METADATA_ONLY"):
             log(f"DEBUG: Graph search incomplete (0 chunks). Performing Entity-Guided Hybrid Search with: {all_entities}")
-            fallback_results = await self._fallback_search(kb_id, query, all_entities, top_k)
+            fallback_results = await stage("fallback_search", self._fallback_search(kb_id, query, all_entities, top_k, context))
             if fallback_results:
                 log(f"DEBUG: Entity-Guided Search success! Retrieved {len(fallback_results)} chunks.")
                 results = fallback_results
@@ -135,6 +189,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
             "triples": graph_result.get("triples", []),
             "total_chunks_found": len(results), # Use final results count (includes Entity-Guided chunks)
             "query_analysis": query_analysis,
+            "stage_timings": {name: {"start_ms": s, "end_ms": e} for name, (s, e) in stage_times.items()},
             "trace_logs": trace_logs
         }
 
@@ -155,65 +210,65 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         
         return results
 
-    async def _extract_entities(self, kb_id: str, query: str) -> List[str]:
-        """Extract main entities from the query using LLM and spaCy Gazetteer."""
-        entities = set()
-        
-        # 1. LLM Extraction
-        prompt = f"""
-        Extract key entities (subjects, objects, concepts, proper nouns) from the search query.
-        Include specific terms that might be nodes in a knowledge graph.
-        Don't be too generic (e.g., avoid "technology" if a specific name is implied, but include "1인자" or "Master" if present).
-        
-        Query: {query}
-        
-        Output format: {{"entities": ["Elon Musk", "SpaceX", "CEO"]}}
-        """
-        try:
+    @staticmethod
+    def _critical_path(stage_times: Dict[str, tuple]) -> str:
+        """Describe the chain of stages that determined when the graph query could start."""
+        analysis_end = stage_times.get("analyze_query", (0, 0))[1]
+        expand_end = stage_times.get("expand_entities", (0, 0))[1]
+        if analysis_end > expand_end:
+            path = ["analyze_query", "graph_query"]
+        else:
+            path = ["extract_entities", "expand_entities", "graph_query"]
+        stages = ", ".join(f"{name}={s}-{e}ms" for name, (s, e) in stage_times.items())
+        total = stage_times.get("graph_query", (0, 0))[1]
+        return f"Pipeline stages: {stages} | critical path: {' -> '.join(path)} ({total} ms)"
+
+    async def _json_completion(self, system_prompt: str, prompt_template: str, query: str, model: str = "gpt-4o-mini") -> Dict[str, Any]:
+        """Temperature-0 JSON completion, served from the LLM response cache when possible."""
+        async def call():
             response = await self.client.chat.completions.create(
-                model="gpt-4o-mini", # Use smarter model for extraction
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are a precise entity extractor for Knowledge Graphs. Output JSON only."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt_template.format(query=query)}
                 ],
                 temperature=0,
                 response_format={"type": "json_object"}
             )
-            content = response.choices[0].message.content
-            data = json.loads(content)
+            return json.loads(response.choices[0].message.content)
+
+        # Neither prompt depends on the KB, so entries are shared across KBs
+        return await llm_cache.cached_call(call, template=system_prompt + prompt_template, model=model, text=query)
+
+    async def _extract_entities(self, kb_id: str, query: str) -> List[str]:
+        """Extract main entities from the query using LLM and spaCy Gazetteer (run concurrently)."""
+        llm_entities, gazetteer_entities = await asyncio.gather(
+            self._extract_entities_llm(query),
+            asyncio.to_thread(self._extract_entities_spacy, kb_id, query)
+        )
+        return list(set(llm_entities) | set(gazetteer_entities))
+
+    async def _extract_entities_llm(self, query: str) -> List[str]:
+        entities = []
+        
+        # 1. LLM Extraction
+        try:
+            data = await self._json_completion(ENTITY_EXTRACTION_SYSTEM_PROMPT, ENTITY_EXTRACTION_PROMPT, query)
             for e in data.get("entities", []):
-                entities.add(e)
+                entities.append(e)
         except Exception as e:
             logger.error(f"Error extracting query entities with LLM: {e}")
+        return entities
+
+    def _extract_entities_spacy(self, kb_id: str, query: str) -> List[str]:
+        entities = set()
 
         # 2. spaCy Gazetteer Extraction (Use known entities)
         try:
-            from app.services.ingestion.spacy_processor import SpacyGraphProcessor
-            # Instantiate processor to access known entities map
-            processor = SpacyGraphProcessor(kb_id)
-            
-            # Use inner nlp pipeline directly? Or add a method to processor to extract from query?
-            # Re-using extract_graph_elements seems too heavy as it builds triples.
-            # We just want the entities.
-            
-            # Let's use the processor's resources
-            doc = processor.nlp(query)
-            
-            # Matcher
-            matches = processor.matcher(doc)
-            for match_id, start, end in matches:
-                span = doc[start:end]
-                # Apply same normalization!
-                norm = processor._normalize_entity(span)
-                if norm:
-                    entities.add(norm)
-            
-            # NER (Optional: LLM usually covers this, but spaCy local might catch specific patterns)
-            for ent in doc.ents:
-                norm = processor._normalize_entity(ent)
-                if norm:
-                    entities.add(norm)
-                    
+            from app.services.ingestion.spacy_processor import get_processor
+            # Warm per-KB processor; its PhraseMatcher is only updated when the entity store changes
+            processor = get_processor(kb_id)
+            entities.update(processor.find_entities(query))
         except Exception as e:
             logger.warning(f"Error extracting query entities with spaCy: {e}")
             
@@ -251,36 +306,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         
         # Use LLM for better understanding
         try:
-            prompt = f"""
-            Analyze this search query and extract:
-            1. The main subject/entity being asked about
-            2. The type of relationship being queried (if any)
-            3. Whether it's a multi-hop query (e.g., "A's B's C")
-            4. Potential alternative entity names or aliases
-            
-            Query: {query}
-            
-            Output format:
-            {{
-                "subject": "main entity name",
-                "relationship_type": "master/student/creator/etc or null",
-                "is_multi_hop": true/false,
-                "hop_count": 1 or 2 or 3,
-                "alternatives": ["alternative names or related entities"]
-            }}
-            """
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a query analyzer for graph search. Be precise and output only JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                response_format={"type": "json_object"}
-            )
-            
-            llm_analysis = json.loads(response.choices[0].message.content)
+            llm_analysis = await self._json_completion(QUERY_ANALYSIS_SYSTEM_PROMPT, QUERY_ANALYSIS_PROMPT, query)
             analysis.update(llm_analysis)
             
         except Exception as e:
@@ -335,7 +361,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         """
         
         try:
-            results = fuseki_client.query_sparql(kb_id, expand_query)
+            results = await fuseki_client.query_sparql(kb_id, expand_query)
             for binding in results.get("results", {}).get("bindings", []):
                 label = binding.get("relatedLabel", {}).get("value", "")
                 if label and label not in entities:
@@ -345,7 +371,7 @@ class GraphRetrievalStrategy(RetrievalStrategy):
         
         return list(expanded)[:10]  # Limit to prevent explosion
 
-    async def _fallback_search(self, kb_id: str, query: str, entities: List[str], top_k: int) -> List[Dict[str, Any]]:
+    async def _fallback_search(self, kb_id: str, query: str, entities: List[str], top_k: int, context: RetrievalContext) -> List[Dict[str, Any]]:
         """Fallback to hybrid vector+keyword search when graph doesn't have complete data."""
         from .vector import VectorRetrievalStrategy
         from .hybrid import HybridRetrievalStrategy
@@ -363,7 +389,8 @@ class GraphRetrievalStrategy(RetrievalStrategy):
                 query=enhanced_query,
                 top_k=top_k,
                 score_threshold=0.0,
-                metric_type="COSINE"
+                metric_type="COSINE",
+                context=context
             )
             
             # Mark these as fallback results
@@ -377,24 +404,17 @@ class GraphRetrievalStrategy(RetrievalStrategy):
             logger.error(f"Error in fallback search: {e}")
             return []
 
-    async def _fetch_chunks(self, kb_id: str, chunk_ids: List[str], query: str, top_k: int) -> List[Dict[str, Any]]:
-        collection = create_collection(kb_id)
-        collection.load()
-        
+    async def _fetch_chunks(self, kb_id: str, chunk_ids: List[str], query: str, top_k: int, context: RetrievalContext) -> List[Dict[str, Any]]:
         # Limit to avoid huge query
         target_ids = chunk_ids[:100] # Safety limit
         
-        expr = f'chunk_id in {json.dumps(target_ids)}'
-        
-        results = collection.query(
-            expr=expr,
-            output_fields=["content", "doc_id", "chunk_id", "vector"]
-        )
+        # Rows already fetched earlier in this request (e.g. by hybrid) are reused
+        results = (await context.fetch_chunks(target_ids, with_vector=True)).values()
         
         retrieved = []
         
         # Calculate cosine similarity for scoring (so we can merge with vector results)
-        query_vec = (await embedding_service.get_embeddings([query]))[0]
+        query_vec = await context.get_query_embedding(query)
         
         for hit in results:
             chunk_vector = hit.get("vector")
@@ -1,8 +1,11 @@
+import asyncio
+import json
 import re
 import urllib.parse
 from typing import List, Dict, Any
 from .base import GraphBackend
 from app.core.fuseki import fuseki_client
+from app.services.llm_cache import llm_cache
 
 class FusekiBackend(GraphBackend):
     """Fuseki (Ontology) implementation of GraphBackend."""
@@ -45,12 +48,30 @@ class FusekiBackend(GraphBackend):
                 if not kwargs.get("enable_inverse_search", True):
                     inv_mode = "none"
                     
-                gen_result = self.generator.generate(
-                    question=query_text,
-                    context=f"Entities: {', '.join(entities)}",
-                    mode="ontology",
-                    inverse_relation=inv_mode,
-                    custom_prompt=kwargs.get("custom_query_prompt")
+                generator = self.generator
+                gen_context = f"Entities: {', '.join(entities)}"
+                custom_prompt = kwargs.get("custom_query_prompt")
+
+                async def generate():
+                    # The external Doc2Onto generator is synchronous (blocking HTTP); keep it off the event loop
+                    return await asyncio.to_thread(
+                        generator.generate,
+                        question=query_text,
+                        context=gen_context,
+                        mode="ontology",
+                        inverse_relation=inv_mode,
+                        custom_prompt=custom_prompt
+                    )
+
+                # Cached per KB graph version; failed generations are not cached
+                gen_result = await llm_cache.cached_call(
+                    generate,
+                    template=getattr(generator, "SYSTEM_PROMPT", type(generator).__qualname__),
+                    model=getattr(generator, "llm_model", ""),
+                    text=json.dumps([query_text, gen_context, "ontology", inv_mode], ensure_ascii=False),
+                    custom_prompt=custom_prompt,
+                    kb_id=kb_id,
+                    cacheable=lambda r: bool(r.get("sparql"))
                 )
                 
                 generated_sparql = gen_result.get("sparql")
@@ -81,7 +102,7 @@ class FusekiBackend(GraphBackend):
                     full_query = prefixes + sparql_query_content
                     
                     # Execute
-                    results = fuseki_client.query_sparql(kb_id, full_query)
+                    results = await fuseki_client.query_sparql(kb_id, full_query)
                     bindings = results.get("results", {}).get("bindings", [])
                     
                     if bindings:
@@ -195,7 +216,7 @@ class FusekiBackend(GraphBackend):
         """
         
         print(f"DEBUG: [Fuseki] SPARQL Query (Fallback):\n{sparql_query}")
-        results = fuseki_client.query_sparql(kb_id, sparql_query)
+        results = await fuseki_client.query_sparql(kb_id, sparql_query)
         bindings = results.get("results", {}).get("bindings", [])
         
         if bindings:
@@ -1,6 +1,8 @@
+import json
 import logging
 from typing import List, Dict, Any
 from app.core.neo4j_client import neo4j_client
+from app.services.llm_cache import llm_cache
 from .base import GraphBackend
 
 logger = logging.getLogger(__name__)
@@ -46,11 +48,23 @@ class Neo4jBackend(GraphBackend):
             if not kwargs.get("enable_inverse_search", True):
                 inv_mode = "none"
 
-            gen_result = generator.generate(
-                query_text, 
-                context=context, 
+            async def generate():
+                return await generator.generate(
+                    query_text, 
+                    context=context, 
+                    custom_prompt=custom_prompt,
+                    inverse_search_mode=inv_mode
+                )
+
+            # Cached per KB graph version; failed generations are not cached
+            gen_result = await llm_cache.cached_call(
+                generate,
+                template=generator.SYSTEM_PROMPT,
+                model=generator.llm_model,
+                text=json.dumps([query_text, context, inv_mode], ensure_ascii=False),
                 custom_prompt=custom_prompt,
-                inverse_search_mode=inv_mode
+                kb_id=kb_id,
+                cacheable=lambda r: bool(r.get("cypher"))
             )
             cypher_query = gen_result.get("cypher")
             thought = gen_result.get("thought")
@@ -62,7 +76,7 @@ class Neo4jBackend(GraphBackend):
                 return {"chunk_ids": [], "sparql_query": "Generation Failed", "triples": []}
                 
             # Execute generated query
-            records = neo4j_client.execute_query(cypher_query)
+            records = await neo4j_client.execute_query(cypher_query, {"kb_id": kb_id})
             
             chunk_ids = set()
             discovered_entities = set()
@@ -102,12 +116,16 @@ class Neo4jBackend(GraphBackend):
                 target_entities = list(discovered_entities)[:20]
                 
                 chunk_query = """
-                MATCH (e:Entity)-[:MENTIONED_IN]->(c:Chunk)
-                WHERE e.label_ko IN $entities OR e.name IN $entities
+                CALL {
+                    MATCH (e:Entity {kb_id: $kb_id}) WHERE e.name IN $entities RETURN e
+                    UNION
+                    MATCH (e:Entity {kb_id: $kb_id}) WHERE e.label_ko IN $entities RETURN e
+                }
+                MATCH (e)-[:MENTIONED_IN]->(c:Chunk)
                 RETURN DISTINCT c.id as chunk_id
                 LIMIT 50
                 """
-                c_records = neo4j_client.execute_query(chunk_query, {"entities": target_entities})
+                c_records = await neo4j_client.execute_query(chunk_query, {"entities": target_entities, "kb_id": kb_id})
                 for r in c_records:
                     chunk_ids.add(r["chunk_id"])
                     
@@ -116,7 +134,7 @@ class Neo4jBackend(GraphBackend):
             
             triples = []
             if chunk_ids_list:
-                triples = self._fetch_relevant_triples(chunk_ids_list)
+                triples = await self._fetch_relevant_triples(chunk_ids_list)
 
             return {
                 "chunk_ids": chunk_ids_list,
@@ -132,41 +150,51 @@ class Neo4jBackend(GraphBackend):
             traceback.print_exc()
             return {"chunk_ids": [], "sparql_query": "Error", "triples": []}
 
-    def _fetch_relevant_triples(self, chunk_ids: List[str]) -> List[Dict[str, str]]:
-        """Fetch triples connected to the discovered chunks for metadata display."""
+    async def _fetch_relevant_triples(
+        self, chunk_ids: List[str], per_chunk: int = 3, max_triples: int = 10
+    ) -> List[Dict[str, str]]:
+        """Fetch triples connected to the discovered chunks for metadata display (one round trip).
+
+        At most `per_chunk` relations per chunk and `max_triples` overall, so the
+        metadata stays as small as the previous 10-triple query.
+        """
         triples = []
         try:
+            # Anchored on the Chunk nodes: entities mentioned in each chunk, then their
+            # relations to other entities (either direction), up to `per_chunk` per chunk.
             # Use any relationship type (not just :RELATION) since we now use dynamic types
             # Support both Doc2Onto schema (label_ko) and legacy schema (name)
             triples_query = """
-            MATCH (s:Entity)-[r]->(o:Entity)
+            UNWIND $chunk_ids AS chunk_id
+            MATCH (:Chunk {id: chunk_id})<-[:MENTIONED_IN]-(:Entity)-[r]-(:Entity)
             WHERE type(r) <> 'MENTIONED_IN'
-              AND ((s)-[:MENTIONED_IN]->(:Chunk {id: $chunk_id}) 
-                   OR (o)-[:MENTIONED_IN]->(:Chunk {id: $chunk_id}))
-            RETURN DISTINCT 
+            WITH chunk_id, collect(DISTINCT r)[..$per_chunk] AS rels
+            UNWIND rels AS r
+            WITH DISTINCT r, startNode(r) AS s, endNode(r) AS o
+            RETURN
                 COALESCE(s.label_ko, s.name, "Node(" + elementId(s) + ")") as subj, 
                 type(r) as pred, 
                 COALESCE(o.label_ko, o.name, "Node(" + elementId(o) + ")") as obj
-            LIMIT 10
+            LIMIT $max_triples
             """
             
+            t_records = await neo4j_client.execute_query(
+                triples_query, {"chunk_ids": chunk_ids, "per_chunk": per_chunk, "max_triples": max_triples}
+            )
             seen_triples = set()
-            for chunk_id in chunk_ids[:5]:  # Limit to first 5 chunks to avoid too many queries
-                try:
-                    t_records = neo4j_client.execute_query(triples_query, {"chunk_id": chunk_id})
-                    for r in t_records:
-                        triple_key = (r["subj"], r["pred"], r["obj"])
-                        if triple_key not in seen_triples:
-                            seen_triples.add(triple_key)
-                            triples.append({
-                                "subject": r["subj"], 
-                                "predicate": r["pred"], 
-                                "object": r["obj"]
-                            })
-                except Exception as e:
-                    logger.warning(f"Error fetching triples for chunk {chunk_id}: {e}")
+            for r in t_records:
+                if len(triples) >= max_triples:
+                    break
+                triple_key = (r["subj"], r["pred"], r["obj"])
+                if triple_key not in seen_triples:
+                    seen_triples.add(triple_key)
+                    triples.append({
+                        "subject": r["subj"], 
+                        "predicate": r["pred"], 
+                        "object": r["obj"]
+                    })
             
-            print(f"DEBUG: Found {len(triples)} relevant triples from discovered chunks")
+            print(f"DEBUG: Found {len(triples)} relevant triples from {len(chunk_ids)} discovered chunks")
         except Exception as e:
             logger.error(f"Error in _fetch_relevant_triples: {e}")
         
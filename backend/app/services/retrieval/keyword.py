@@ -1,7 +1,8 @@
 from typing import List, Dict, Any
-from app.core.milvus import create_collection
 from app.services.embedding import embedding_service
 from .base import RetrievalStrategy
+from .context import RetrievalContext
+import heapq
 import numpy as np
 from openai import AsyncOpenAI
 from app.core.config import settings
@@ -37,6 +38,7 @@ class KeywordRetrievalStrategy(RetrievalStrategy):
     async def search(self, kb_id: str, query: str, top_k: int, **kwargs) -> List[Dict[str, Any]]:
         score_threshold = kwargs.get("score_threshold", 0.0)
         use_llm_extraction = kwargs.get("use_llm_keyword_extraction", False)
+        context = RetrievalContext.from_kwargs(kb_id, kwargs)
         
         with open("backend_debug.log", "a") as f:
             f.write(f"Keyword Search Start. Query: {query}, TopK: {top_k}\n")
@@ -44,56 +46,39 @@ class KeywordRetrievalStrategy(RetrievalStrategy):
         # LLM Keyword Extraction
         search_query = query
         if use_llm_extraction:
-            search_query = await self.extract_keywords_with_llm(query)
-
-        collection = create_collection(kb_id)
-        collection.load()
-        
-        from rank_bm25 import BM25Okapi
-
-        # Fetch candidate chunks from Milvus (fetch generic candidates)
-        # Note: In a real large-scale system, you'd use an Inverted Index (Elasticsearch/Solr)
-        results = collection.query(
-            expr="id >= 0",
-            output_fields=["content", "doc_id", "chunk_id"],
-            limit=2000
-        )
-        
-        if not results:
-            return []
+            search_query = await context.extract_keywords_with_llm(query)
 
         # Use shared tokenizer utility - choose mode based on use_multi_pos
-        from app.services.retrieval.tokenizer import korean_tokenize
         use_multi_pos = kwargs.get("use_multi_pos", False)  # Default False for keyword-only search
         tokenize_mode = 'extended' if use_multi_pos else 'strict'
 
-        # Tokenize Corpus
-        tokenized_corpus = [korean_tokenize(hit.get("content", ""), mode=tokenize_mode, include_original_words=False, min_length=1) for hit in results]
-        
-        bm25 = BM25Okapi(tokenized_corpus)
+        # Score against the persistent per-KB inverted index (only query-term postings are visited)
+        tokenized_query = await context.tokenize(search_query, tokenize_mode)
+        doc_scores = await context.bm25_scores(tokenized_query, tokenize_mode)
         
-        # Tokenize Query
-        tokenized_query = korean_tokenize(search_query, mode=tokenize_mode, include_original_words=False, min_length=1)
-        doc_scores = bm25.get_scores(tokenized_query)
+        if not doc_scores:
+            return []
+
+        # BM25 scores are not 0-1. They are positive floats.
+        top_hits = heapq.nlargest(top_k, ((score, cid) for cid, score in doc_scores.items() if score > 0))
+        if not top_hits:
+            return []
+
+        # Fetch content only for the final hits
+        row_map = await context.fetch_chunks([cid for _, cid in top_hits])
         
-        # Combine results with scores
-        retrieved = []
-        for i, score in enumerate(doc_scores):
-            # BM25 scores are not 0-1. They are positive floats.
-            if score <= 0:
+        final_res = []
+        for score, cid in top_hits:
+            hit = row_map.get(cid)
+            if not hit:
                 continue
-                
-            hit = results[i]
-            retrieved.append({
-                "chunk_id": hit.get("chunk_id"),
+            final_res.append({
+                "chunk_id": cid,
                 "content": hit.get("content"),
                 "score": float(score), # BM25 score
                 "metadata": {"doc_id": hit.get("doc_id")}
             })
         
-        retrieved.sort(key=lambda x: x["score"], reverse=True)
-        final_res = retrieved[:top_k]
-        
         # Attach extracted keywords to ALL results for UI display
         # This ensures the keywords are available even if some chunks are filtered/reranked
         for result in final_res:
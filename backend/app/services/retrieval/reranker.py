@@ -1,18 +1,33 @@
 from typing import List, Dict, Any, Optional
+from app.core.config import settings
 from app.services.embedding import embedding_service
-from sentence_transformers import CrossEncoder # type: ignore
+from .cross_encoder import cross_encoder_service
+from .score_cache import ScoreCache
 import numpy as np
+import asyncio
+import json
+import logging
 import math
 
+logger = logging.getLogger(__name__)
+
+LLM_LISTWISE_PROMPT = """Rate how relevant each numbered passage is to the query, from 0.0 (irrelevant) to 1.0 (directly answers it).
+
+Query: {query}
+
+Passages:
+{passages}
+
+Return ONLY a JSON object mapping every passage number to its score, e.g. {{"1": 0.9, "2": 0.1}}."""
+
 class RerankingService:
     def __init__(self):
-        self.reranker = None
-    
-    def _get_reranker(self):
-        if not self.reranker:
-            self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
-        return self.reranker
-        
+        self._openai_client = None
+        self._llm_semaphore = None
+        self._llm_semaphore_loop = None
+        self._encoding = None
+        self.llm_score_cache = ScoreCache(settings.LLM_RERANK_CACHE_SIZE)
+
     def _cosine_similarity(self, vec1, vec2) -> float:
         v1 = np.array(vec1)
         v2 = np.array(vec2)
@@ -22,20 +37,28 @@ class RerankingService:
             return 0.0
         return float(np.dot(v1, v2) / (norm1 * norm2))
 
+    def _cosine_similarities(self, query_vec, vectors) -> List[float]:
+        """Cosine of the query against each vector, in one vectorized step."""
+        q = np.asarray(query_vec, dtype=np.float32)
+        m = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(m, axis=1) * np.linalg.norm(q)
+        sims = np.divide(m @ q, norms, out=np.zeros(len(m), dtype=np.float32), where=norms != 0)
+        return [float(s) for s in sims]
+
     async def rerank_results(
         self,
         query: str,
         results: List[Dict],
         top_k: int = 5,
-        threshold: float = 0.0
+        threshold: float = 0.0,
+        embedding_provider=None,
+        context=None
     ) -> List[Dict]:
         """Rerank using Cross-Encoder"""
         if not results:
             return []
             
-        reranker = self._get_reranker()
-        pairs = [[query, result['content']] for result in results]
-        reranker_scores = reranker.predict(pairs)
+        reranker_scores = await cross_encoder_service.score(query, [result['content'] for result in results])
         
         # Sigmoid normalization
         normalized_scores = [1 / (1 + math.exp(-score)) for score in reranker_scores]
@@ -48,60 +71,171 @@ class RerankingService:
         top_results = filtered[:top_k]
         
         # Reset score to Cosine for uniformity
-        # Need embeddings for cosine
-        query_vec = (await embedding_service.get_embeddings([query]))[0]
-        
-        for result in top_results:
-            content_vec = (await embedding_service.get_embeddings([result['content']]))[0]
-            result['score'] = self._cosine_similarity(query_vec, content_vec)
+        # Uses the chunks' stored vectors (RetrievalContext) instead of re-embedding their content
+        if top_results:
+            if context is not None:
+                query_vec = await context.get_query_embedding(query)
+                content_vecs = await context.get_chunk_vectors(top_results)
+            else:
+                query_vec = await embedding_service.get_query_embedding(query, provider=embedding_provider)
+                content_vecs = await embedding_service.get_embeddings([r['content'] for r in top_results], provider=embedding_provider)
             
-            if 'metadata' not in result: result['metadata'] = {}
-            result['metadata']['_reranker_score'] = result.pop('_reranker_score')
+            for result, score in zip(top_results, self._cosine_similarities(query_vec, content_vecs)):
+                result['score'] = score
+                
+                if 'metadata' not in result: result['metadata'] = {}
+                result['metadata']['_reranker_score'] = result.pop('_reranker_score')
             
         return top_results
 
+    # --- LLM reranking ---
+
+    def _llm_client(self):
+        if self._openai_client is None:
+            from openai import AsyncOpenAI
+            self._openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._openai_client
+
+    def _llm_slot(self) -> asyncio.Semaphore:
+        """Process-wide limit on concurrent LLM rerank calls (one semaphore per event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._llm_semaphore_loop is not loop:
+            self._llm_semaphore = asyncio.Semaphore(settings.LLM_RERANK_CONCURRENCY)
+            self._llm_semaphore_loop = loop
+        return self._llm_semaphore
+
+    def _get_encoding(self):
+        """Lazy tiktoken encoder; False if unavailable (then tokens are estimated by characters)."""
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable ({e}). Estimating tokens by character count.")
+                self._encoding = False
+        return self._encoding
+
+    def _truncate_tokens(self, text: str, max_tokens: int) -> str:
+        encoding = self._get_encoding()
+        if not encoding:
+            return text[:max_tokens * 2]
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+    def _listwise_batches(self, contents: List[str]) -> List[List[int]]:
+        """Split chunk indices into as few prompts as the token budget allows.
+
+        Each chunk gets an equal share of LLM_RERANK_PROMPT_TOKENS (capped at
+        LLM_RERANK_CHUNK_MAX_TOKENS); only if that share would drop below
+        LLM_RERANK_CHUNK_MIN_TOKENS are the chunks spread over several prompts.
+        """
+        budget = settings.LLM_RERANK_PROMPT_TOKENS
+        per_prompt = max(1, budget // settings.LLM_RERANK_CHUNK_MIN_TOKENS)
+        n_prompts = math.ceil(len(contents) / per_prompt)
+        size = math.ceil(len(contents) / n_prompts)
+        indices = list(range(len(contents)))
+        return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+    async def _llm_score_listwise(self, query: str, contents: List[str]) -> List[Optional[float]]:
+        """Score many chunks per completion (None where the call failed or the LLM left a chunk out)."""
+        scores: List[Optional[float]] = [None] * len(contents)
+
+        async def score_batch(batch: List[int]):
+            per_chunk = min(
+                settings.LLM_RERANK_CHUNK_MAX_TOKENS,
+                max(settings.LLM_RERANK_CHUNK_MIN_TOKENS, settings.LLM_RERANK_PROMPT_TOKENS // len(batch))
+            )
+            passages = "\n\n".join(
+                f"[{n}] {self._truncate_tokens(contents[i], per_chunk)}" for n, i in enumerate(batch, start=1)
+            )
+            prompt = LLM_LISTWISE_PROMPT.format(query=query, passages=passages)
+            try:
+                async with self._llm_slot():
+                    resp = await self._llm_client().chat.completions.create(
+                        model=settings.LLM_RERANK_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0,
+                        response_format={"type": "json_object"}
+                    )
+                content = resp.choices[0].message.content
+                data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+                for n, i in enumerate(batch, start=1):
+                    try:
+                        scores[i] = max(0.0, min(1.0, float(data[str(n)])))
+                    except (KeyError, TypeError, ValueError):
+                        pass
+            except Exception as e:
+                logger.warning(f"Listwise LLM rerank failed for {len(batch)} chunks: {e}")
+
+        await asyncio.gather(*[score_batch(batch) for batch in self._listwise_batches(contents)])
+        return scores
+
+    async def _llm_score_pointwise(self, query: str, contents: List[str]) -> List[Optional[float]]:
+        """One completion per chunk (bounded by the global LLM semaphore); None where the call failed."""
+        async def evaluate(chunk_content: str) -> Optional[float]:
+            prompt = f"""Query: {query}\n\nChunk: {chunk_content}\n\nRate relevance from 0.0 to 1.0 (float). Output ONLY the number."""
+            
+            try:
+                async with self._llm_slot():
+                    resp = await self._llm_client().chat.completions.create(
+                        model=settings.LLM_RERANK_MODEL,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0, max_tokens=10
+                    )
+                score = float(resp.choices[0].message.content.strip())
+                return max(0.0, min(1.0, score))
+            except:
+                return None
+
+        return list(await asyncio.gather(*[evaluate(c) for c in contents]))
+
     async def llm_rerank_results(
         self,
         query: str,
         results: List[Dict],
         top_k: int = 5,
         threshold: float = 0.0,
-        strategy: str = "full"
+        strategy: str = "full",
+        mode: Optional[str] = None
     ) -> List[Dict]:
-        """Rerank using LLM (OpenAI)"""
+        """Rerank using LLM (OpenAI).
+
+        mode "listwise" (default, LLM_RERANK_MODE) scores many chunks per prompt;
+        "pointwise" sends one prompt per chunk. Scores are cached per (query, chunk).
+        """
         if not results:
             return []
             
-        from openai import AsyncOpenAI
-        from app.core.config import settings
-        import asyncio
-        
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        async def evaluate(result: Dict) -> tuple[Dict, float]:
+        mode = (mode or settings.LLM_RERANK_MODE).lower()
+        contents = []
+        for result in results:
             chunk_content = result['content']
-            
             # Simple truncation for brevity in prompt (implement 'smart' logic if needed from original)
             if strategy == 'limited':
                 chunk_content = chunk_content[:1500]
-            
-            prompt = f"""Query: {query}\n\nChunk: {chunk_content}\n\nRate relevance from 0.0 to 1.0 (float). Output ONLY the number."""
-            
-            try:
-                resp = await client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0, max_tokens=10
-                )
-                score = float(resp.choices[0].message.content.strip())
-                return (result, max(0.0, min(1.0, score)))
-            except:
-                return (result, 0.0)
-                
-        tasks = [evaluate(r) for r in results]
-        evaluated = await asyncio.gather(*tasks)
+            contents.append(chunk_content)
+
+        # Cached per (model + mode, query, chunk content); only misses go to the LLM
+        cache_model = f"llm:{settings.LLM_RERANK_MODEL}:{mode}"
+        scores = self.llm_score_cache.get_many(cache_model, query, contents)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            missing_contents = [contents[i] for i in missing]
+            if mode == "pointwise":
+                new_scores = await self._llm_score_pointwise(query, missing_contents)
+            else:
+                new_scores = await self._llm_score_listwise(query, missing_contents)
+            scored = [(i, score) for i, score in zip(missing, new_scores) if score is not None]
+            # Failed evaluations score 0.0 for this request but are not cached
+            for i in missing:
+                scores[i] = 0.0
+            for i, score in scored:
+                scores[i] = score
+            self.llm_score_cache.put_many(
+                cache_model, query, [contents[i] for i, _ in scored], [score for _, score in scored]
+            )
         
-        for result, score in evaluated:
+        for result, score in zip(results, scores):
             result['_llm_score'] = score
             if 'metadata' not in result: result['metadata'] = {}
             result['metadata']['_llm_reranker_score'] = score
@@ -115,4 +249,11 @@ class RerankingService:
             
         return filtered[:top_k]
 
+    def stats(self) -> dict:
+        """Cross-encoder batching/score-cache and LLM score-cache counters."""
+        return {
+            "cross_encoder": cross_encoder_service.stats(),
+            "llm_score_cache": self.llm_score_cache.stats(),
+        }
+
 reranking_service = RerankingService()
@@ -0,0 +1,64 @@
+"""
+Bounded in-process LRU cache for reranker scores.
+
+Keyed by (scoring model, normalized query, sha256 of the chunk content), so the
+same (query, chunk) pair is only scored once no matter which strategy or request
+produced the chunk. Scores are pure functions of that key, so there is no
+invalidation beyond LRU eviction.
+"""
+
+from app.services.embedding_cache import text_hash
+from app.services.llm_cache import normalize_input
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+
+
+class ScoreCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scores: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, query: str, content: str) -> Tuple[str, str, str]:
+        return (model, normalize_input(query), text_hash(content))
+
+    def get_many(self, model: str, query: str, contents: Sequence[str]) -> List[Optional[float]]:
+        """Cached score per content (None for misses)."""
+        keys = [self.make_key(model, query, content) for content in contents]
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, model: str, query: str, contents: Sequence[str], scores: Sequence[float]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for content, score in zip(contents, scores):
+                key = self.make_key(model, query, content)
+                self._scores[key] = float(score)
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._scores),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
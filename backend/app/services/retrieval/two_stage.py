@@ -1,42 +1,36 @@
 from typing import List, Dict, Any
 from .base import RetrievalStrategy
 from .vector import VectorRetrievalStrategy
-from app.core.milvus import create_collection
-from app.services.embedding import embedding_service
-from sentence_transformers import CrossEncoder # type: ignore
+from app.core.config import settings
+from app.core.milvus import get_collection, ann_search_params, distance_to_cosine, normalize_vectors
+from .context import RetrievalContext
+from .cross_encoder import cross_encoder_service
 import numpy as np
 
 class TwoStageRetrievalStrategy(RetrievalStrategy):
-    def __init__(self):
-        self.reranker = None
-        
-    def _get_reranker(self):
-        if not self.reranker:
-            self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
-        return self.reranker
-
     async def search(self, kb_id: str, query: str, top_k: int, **kwargs) -> List[Dict[str, Any]]:
         metric_type = kwargs.get("metric_type", "COSINE")
         score_threshold = kwargs.get("score_threshold", 0.0)
+        recompute = kwargs.get("vector_score_mode", settings.VECTOR_SCORE_MODE) == "recompute"
+        context = RetrievalContext.from_kwargs(kb_id, kwargs)
         
         # 1. Candidate Generation (Vector Search with high K)
-        collection = create_collection(kb_id)
-        collection.load()
+        collection = get_collection(kb_id)
         
-        query_vectors = await embedding_service.get_embeddings([query])
-        query_vec = query_vectors[0]
+        query_vec = await context.get_query_embedding(query)
+        if metric_type != "COSINE":
+            query_vec = normalize_vectors([query_vec])[0]
+        query_vectors = [query_vec]
         
-        search_params = {
-            "metric_type": metric_type,
-            "params": {"nprobe": 10},
-        }
+        # Per-KB ANN params (ef / nprobe / search_list); legacy KBs use IVF_FLAT nprobe=10
+        search_params = ann_search_params(metric_type, context.ann_search_params, limit=top_k * 5)
         
         results = collection.search(
             data=query_vectors, 
             anns_field="vector", 
             param=search_params, 
             limit=top_k * 5, 
-            output_fields=["content", "doc_id", "chunk_id", "vector"]
+            output_fields=["content", "doc_id", "chunk_id", "vector"] if recompute else ["content", "doc_id", "chunk_id"]
         )
         
         candidates = []
@@ -46,16 +40,16 @@ class TwoStageRetrievalStrategy(RetrievalStrategy):
                     "chunk_id": hit.entity.get("chunk_id"),
                     "content": hit.entity.get("content"),
                     "metadata": {"doc_id": hit.entity.get("doc_id")},
-                    "vector": hit.entity.get("vector")
+                    "vector": hit.entity.get("vector") if recompute else None,
+                    "ann_score": distance_to_cosine(hit.distance, metric_type)
                 })
         
         if not candidates:
             return []
 
         # 2. Reranking
-        reranker = self._get_reranker()
-        pairs = [[query, doc["content"]] for doc in candidates]
-        cross_scores = reranker.predict(pairs)
+        with context.timed("rerank"):
+            cross_scores = await cross_encoder_service.score(query, [doc["content"] for doc in candidates])
         
         for i, doc in enumerate(candidates):
             doc["cross_score"] = float(cross_scores[i])
@@ -66,11 +60,12 @@ class TwoStageRetrievalStrategy(RetrievalStrategy):
         filtered = []
         for doc in candidates:
             chunk_vector = doc.get("vector")
-            doc["score"] = 0.0
+            doc["score"] = doc["ann_score"]
             if chunk_vector:
                 doc["score"] = self._cosine_similarity(query_vec, chunk_vector)
             
             doc.pop("vector", None)
+            doc.pop("ann_score", None)
             doc.pop("cross_score", None)
             
             if doc["score"] >= score_threshold:
@@ -1,43 +1,54 @@
 from typing import List, Dict, Any
+import asyncio
 import numpy as np
-from app.core.milvus import create_collection
-from app.services.embedding import embedding_service
+from app.core.config import settings
+from app.core.milvus import get_collection, ann_search_params, distance_to_cosine, normalize_vectors
 from .base import RetrievalStrategy
+from .context import RetrievalContext
 
 class VectorRetrievalStrategy(RetrievalStrategy):
     async def search(self, kb_id: str, query: str, top_k: int, **kwargs) -> List[Dict[str, Any]]:
         score_threshold = kwargs.get("score_threshold", 0.0)
         metric_type = kwargs.get("metric_type", "COSINE")
+        # "milvus": use the ANN distance as the score; "recompute": fetch vectors and recompute cosine
+        recompute = kwargs.get("vector_score_mode", settings.VECTOR_SCORE_MODE) == "recompute"
+        context = RetrievalContext.from_kwargs(kb_id, kwargs)
         
-        collection = create_collection(kb_id)
-        collection.load()
+        # pymilvus is blocking; run its calls in worker threads
+        collection = await asyncio.to_thread(get_collection, kb_id)
 
         # 1. Embed query
-        query_vectors = await embedding_service.get_embeddings([query])
-        query_vec = query_vectors[0]
+        query_vec = await context.get_query_embedding(query)
+        if metric_type != "COSINE":
+            # Stored vectors are normalized for IP, so IP on a normalized query equals cosine
+            query_vec = normalize_vectors([query_vec])[0]
+        query_vectors = [query_vec]
         
         # 2. Search
-        search_params = {
-            "metric_type": metric_type,
-            "params": {"nprobe": 10},
-        }
+        # Per-KB ANN params (ef / nprobe / search_list); legacy KBs use IVF_FLAT nprobe=10
+        search_params = ann_search_params(metric_type, context.ann_search_params, limit=top_k * 3)
         
-        results = collection.search(
-            data=query_vectors, 
-            anns_field="vector", 
-            param=search_params, 
-            limit=top_k * 3,  # Fetch more for filtering
-            output_fields=["content", "doc_id", "chunk_id", "vector"]
-        )
+        with context.timed("ann_search"):
+            results = await asyncio.to_thread(
+                collection.search,
+                data=query_vectors,
+                anns_field="vector",
+                param=search_params,
+                limit=top_k * 3,  # Fetch more for filtering
+                output_fields=["content", "doc_id", "chunk_id", "vector"] if recompute else ["content", "doc_id", "chunk_id"]
+            )
         
         retrieved = []
         for hits in results:
             for hit in hits:
-                # Always compute cosine similarity for unified scoring
-                chunk_vector = hit.entity.get("vector")
-                cosine_score = 0.0
-                if chunk_vector:
-                    cosine_score = self._cosine_similarity(query_vec, chunk_vector)
+                # Unified cosine scoring
+                if recompute:
+                    chunk_vector = hit.entity.get("vector")
+                    cosine_score = 0.0
+                    if chunk_vector:
+                        cosine_score = self._cosine_similarity(query_vec, chunk_vector)
+                else:
+                    cosine_score = distance_to_cosine(hit.distance, metric_type)
                 
                 if cosine_score < score_threshold:
                     continue
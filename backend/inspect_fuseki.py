@@ -27,7 +27,7 @@ async def main():
     
     print(f"Querying KB: {kb_id}")
     try:
-        results = fuseki_client.query_sparql(kb_id, query)
+        results = await fuseki_client.query_sparql(kb_id, query)
         print(f"Found {len(results.get('results', {}).get('bindings', []))} triples related to 성기훈:")
         for b in results.get('results', {}).get('bindings', []):
             s = b.get('sLabel', {}).get('value')
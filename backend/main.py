@@ -64,3 +64,30 @@ async def startup():
     except Exception as e:
         print(f"Failed to connect to Milvus: {e}")
 
+    # Neo4j indexes/constraints (in the background: Neo4j may be unavailable or unused)
+    import asyncio
+    from app.core.neo4j_client import neo4j_client
+    # Keep references to the startup tasks so they aren't garbage-collected mid-run
+    app.state.startup_tasks = [asyncio.create_task(neo4j_client.ensure_schema())]
+
+    # Load and warm up the shared cross-encoder off the request path
+    from app.core.config import settings
+    if settings.RERANKER_PRELOAD:
+        from app.services.retrieval.cross_encoder import cross_encoder_service
+        app.state.startup_tasks.append(asyncio.create_task(cross_encoder_service.warmup()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in getattr(app.state, "startup_tasks", []):
+        task.cancel()
+
+    # Close pooled HTTP connections (LLM API, Fuseki)
+    from app.core.http_client import close_http_clients
+    await close_http_clients()
+
+    from app.core.neo4j_client import neo4j_client
+    await neo4j_client.close()
+
+    from app.services.retrieval.cross_encoder import cross_encoder_service
+    cross_encoder_service.shutdown()
+
@@ -0,0 +1,45 @@
+import asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+import os
+
+# Use the same database URL as in your config
+# If running locally, check if it's in the current dir or backend/
+DATABASE_URL = "sqlite+aiosqlite:///backend/data/rag_system.db"
+if not os.path.exists("backend/data/rag_system.db"):
+    # Fallback for running inside container or different root
+    DATABASE_URL = "sqlite+aiosqlite:///data/rag_system.db"
+    if not os.path.exists("data/rag_system.db"):
+         DATABASE_URL = "sqlite+aiosqlite:///rag_system.db"
+
+async def migrate():
+    print(f"Connecting to {DATABASE_URL}")
+    engine = create_async_engine(DATABASE_URL, echo=True)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        # Existing KBs were embedded with OpenAI
+        for column, ddl in [
+            ("embedding_provider", "ALTER TABLE knowledge_bases ADD COLUMN embedding_provider VARCHAR DEFAULT 'openai'"),
+            ("embedding_model", "ALTER TABLE knowledge_bases ADD COLUMN embedding_model VARCHAR"),
+        ]:
+            try:
+                await session.execute(text(ddl))
+                await session.commit()
+                print(f"Added {column} column to knowledge_bases")
+            except Exception as e:
+                print(f"Column might already exist: {e}")
+                await session.rollback()
+
+        await session.execute(text(
+            "UPDATE knowledge_bases SET embedding_provider = 'openai' WHERE embedding_provider IS NULL"
+        ))
+        await session.commit()
+        print("Updated existing knowledge bases")
+
+    await engine.dispose()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,48 @@
+import asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+import os
+
+# Use the same database URL as in your config
+# If running locally, check if it's in the current dir or backend/
+DATABASE_URL = "sqlite+aiosqlite:///backend/data/rag_system.db"
+if not os.path.exists("backend/data/rag_system.db"):
+    # Fallback for running inside container or different root
+    DATABASE_URL = "sqlite+aiosqlite:///data/rag_system.db"
+    if not os.path.exists("data/rag_system.db"):
+         DATABASE_URL = "sqlite+aiosqlite:///rag_system.db"
+
+async def migrate():
+    print(f"Connecting to {DATABASE_URL}")
+    engine = create_async_engine(DATABASE_URL, echo=True)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        for column, ddl in [
+            ("index_type", "ALTER TABLE knowledge_bases ADD COLUMN index_type VARCHAR"),
+            ("index_params", "ALTER TABLE knowledge_bases ADD COLUMN index_params JSON DEFAULT '{}'"),
+            ("search_params", "ALTER TABLE knowledge_bases ADD COLUMN search_params JSON DEFAULT '{}'"),
+        ]:
+            try:
+                await session.execute(text(ddl))
+                await session.commit()
+                print(f"Added {column} column to knowledge_bases")
+            except Exception as e:
+                print(f"Column might already exist: {e}")
+                await session.rollback()
+
+        # Existing collections were built with IVF_FLAT (nlist=1024) and searched with nprobe=10
+        await session.execute(text(
+            "UPDATE knowledge_bases SET index_type = 'IVF_FLAT', "
+            "index_params = '{\"nlist\": 1024}', search_params = '{\"nprobe\": 10}' "
+            "WHERE index_type IS NULL"
+        ))
+        await session.commit()
+        print("Updated existing knowledge bases")
+
+    await engine.dispose()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
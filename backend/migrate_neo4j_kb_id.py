@@ -0,0 +1,197 @@
+"""
+Scope existing Neo4j graph data by Knowledge Base.
+
+Graph reads are anchored on (:Entity {kb_id}) and (:Chunk {kb_id}). Data written
+before that was not scoped consistently:
+  - the fallback extractor created Entity and Chunk nodes without kb_id
+  - the Doc2Onto loader set kb_id only ON CREATE, so an entity shared by several
+    KBs carries the id of the first one
+
+This script:
+  1. sets Chunk.kb_id from the documents table (chunk ids are "<doc_id>_<n>")
+  2. sets Entity.kb_id from the chunks it is MENTIONED_IN
+  3. splits entities mentioned in several KBs into one node per KB (each copy
+     keeps its own KB's mentions and all of the entity's relations)
+  4. gives entities without mentions the kb_id of a neighbouring entity
+  5. merges duplicate (kb_id, name) entities
+  6. re-points relations that cross KBs so each KB has its own copy (the data
+     doesn't record which KB created a relation, so every KB that could reach
+     it before keeps it)
+  7. recreates the (kb_id, name) uniqueness constraint
+
+Requires APOC (already required by graph ingestion). Safe to run more than once.
+Run from backend/: python migrate_neo4j_kb_id.py
+"""
+
+import asyncio
+from sqlalchemy import text
+from app.core.database import engine
+from app.core.neo4j_client import neo4j_client, Neo4jBatchWriteError
+
+SET_CHUNK_KB = """
+UNWIND $rows AS row
+MATCH (c:Chunk) WHERE c.id STARTS WITH row.doc_id + '_'
+SET c.kb_id = row.kb_id
+"""
+
+ENTITY_MENTION_KBS = """
+MATCH (e:Entity)-[:MENTIONED_IN]->(c:Chunk)
+WHERE c.kb_id IS NOT NULL
+WITH e, collect(DISTINCT c.kb_id) AS kbs
+RETURN elementId(e) AS eid, e.kb_id AS kb_id, kbs
+"""
+
+SET_ENTITY_KB = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.eid
+SET e.kb_id = row.kb_id
+"""
+
+# One copy of the entity per extra KB: takes over that KB's mentions and gets all relations
+SPLIT_ENTITY = """
+UNWIND $rows AS row
+MATCH (e) WHERE elementId(e) = row.eid
+CALL apoc.create.node(labels(e), apoc.map.merge(properties(e), {kb_id: row.kb_id})) YIELD node AS n
+CALL {
+    WITH e, n, row
+    MATCH (e)-[m:MENTIONED_IN]->(c:Chunk {kb_id: row.kb_id})
+    MERGE (n)-[:MENTIONED_IN]->(c)
+    DELETE m
+}
+CALL {
+    WITH e, n
+    MATCH (e)-[r]->(x:Entity)
+    WHERE type(r) <> 'MENTIONED_IN'
+    CALL apoc.create.relationship(n, type(r), properties(r), x) YIELD rel
+    RETURN count(rel) AS outgoing
+}
+CALL {
+    WITH e, n
+    MATCH (x:Entity)-[r]->(e)
+    WHERE type(r) <> 'MENTIONED_IN'
+    CALL apoc.create.relationship(x, type(r), properties(r), n) YIELD rel
+    RETURN count(rel) AS incoming
+}
+RETURN count(n) AS created
+"""
+
+INHERIT_NEIGHBOUR_KB = """
+MATCH (e:Entity)-[r]-(x:Entity)
+WHERE e.kb_id IS NULL AND x.kb_id IS NOT NULL AND type(r) <> 'MENTIONED_IN'
+WITH e, collect(DISTINCT x.kb_id) AS kbs
+SET e.kb_id = kbs[0]
+RETURN count(e) AS updated
+"""
+
+MERGE_DUPLICATES = """
+MATCH (e:Entity)
+WHERE e.kb_id IS NOT NULL AND e.name IS NOT NULL
+WITH e.kb_id AS kb_id, e.name AS name, collect(e) AS nodes
+WHERE size(nodes) > 1
+CALL apoc.refactor.mergeNodes(nodes, {properties: 'discard', mergeRels: true}) YIELD node
+RETURN count(node) AS merged
+"""
+
+CROSS_KB_RELATIONS = """
+MATCH (a:Entity)-[r]->(b:Entity)
+WHERE type(r) <> 'MENTIONED_IN'
+  AND a.kb_id IS NOT NULL AND b.kb_id IS NOT NULL AND a.kb_id <> b.kb_id
+  AND a.name IS NOT NULL AND b.name IS NOT NULL
+RETURN elementId(r) AS rid
+"""
+
+# (a:K1)-[r]->(b:K2) becomes (a)-[r]->(b copy in K1) and (a copy in K2)-[r]->(b)
+SPLIT_RELATION = """
+UNWIND $rows AS row
+MATCH (a)-[r]->(b) WHERE elementId(r) = row.rid
+MERGE (b2:Entity {kb_id: a.kb_id, name: b.name})
+ON CREATE SET b2 += properties(b), b2.kb_id = a.kb_id
+MERGE (a2:Entity {kb_id: b.kb_id, name: a.name})
+ON CREATE SET a2 += properties(a), a2.kb_id = b.kb_id
+WITH a, b, a2, b2, r, type(r) AS rel_type, properties(r) AS props
+CALL apoc.create.addLabels(b2, labels(b)) YIELD node AS b2_labelled
+CALL apoc.create.addLabels(a2, labels(a)) YIELD node AS a2_labelled
+CALL apoc.merge.relationship(a, rel_type, props, {}, b2, {}) YIELD rel AS r1
+CALL apoc.merge.relationship(a2, rel_type, props, {}, b, {}) YIELD rel AS r2
+DELETE r
+"""
+
+
+async def write_batched(query: str, rows: list, batch_size: int = None) -> int:
+    """Batched write that reports failed rows instead of stopping (re-running retries them)."""
+    try:
+        return await neo4j_client.execute_batched(query, rows, batch_size=batch_size)
+    except Neo4jBatchWriteError as e:
+        print(f"  {e}")
+        for row in e.failed_rows[:10]:
+            print(f"  failed: {row}")
+        return e.written
+
+
+async def migrate():
+    if not await neo4j_client.verify_connectivity():
+        print("Neo4j is not reachable. Check NEO4J_URI / credentials.")
+        return
+
+    # 1. Chunks: kb_id of the chunk's document
+    async with engine.begin() as conn:
+        result = await conn.execute(text("SELECT id, kb_id FROM documents"))
+        documents = [{"doc_id": doc_id, "kb_id": kb_id} for doc_id, kb_id in result.fetchall()]
+    written = await write_batched(SET_CHUNK_KB, documents, batch_size=100)
+    print(f"Set Chunk.kb_id for {written}/{len(documents)} documents")
+
+    # 2./3. Entities: kb_id of the chunks they are mentioned in
+    records = await neo4j_client.execute_query(ENTITY_MENTION_KBS)
+    set_rows, split_rows = [], []
+    for r in records:
+        kbs = sorted(r["kbs"])
+        keep = r["kb_id"] if r["kb_id"] in kbs else kbs[0]
+        if keep != r["kb_id"]:
+            set_rows.append({"eid": r["eid"], "kb_id": keep})
+        split_rows.extend({"eid": r["eid"], "kb_id": kb_id} for kb_id in kbs if kb_id != keep)
+    written = await write_batched(SET_ENTITY_KB, set_rows)
+    print(f"Set Entity.kb_id on {written}/{len(set_rows)} entities")
+    written = await write_batched(SPLIT_ENTITY, split_rows, batch_size=100)
+    print(f"Split shared entities into {written}/{len(split_rows)} per-KB copies")
+
+    # 4. Entities without mentions: follow relations, repeated so it propagates along paths
+    while True:
+        records = await neo4j_client.execute_query(INHERIT_NEIGHBOUR_KB)
+        updated = records[0]["updated"] if records else 0
+        if not updated:
+            break
+        print(f"Set Entity.kb_id on {updated} unmentioned entities from their neighbours")
+
+    # 5./6. Merge duplicates, then give each KB its own copy of relations crossing KBs
+    records = await neo4j_client.execute_query(MERGE_DUPLICATES)
+    print(f"Merged duplicate (kb_id, name) entities into {records[0]['merged'] if records else 0} nodes")
+
+    records = await neo4j_client.execute_query(CROSS_KB_RELATIONS)
+    rows = [{"rid": r["rid"]} for r in records]
+    written = await write_batched(SPLIT_RELATION, rows, batch_size=100)
+    print(f"Split {written}/{len(rows)} relations crossing KBs")
+
+    records = await neo4j_client.execute_query(MERGE_DUPLICATES)
+    print(f"Merged duplicate (kb_id, name) entities into {records[0]['merged'] if records else 0} nodes")
+
+    records = await neo4j_client.execute_query("MATCH (e:Entity) WHERE e.kb_id IS NULL RETURN count(e) AS n")
+    if records and records[0]["n"]:
+        print(f"{records[0]['n']} entities still have no kb_id (no mentions and no scoped neighbours); they are not visible to any KB")
+
+    # 7. The plain index was only a fallback for the constraint (duplicates are gone now)
+    await neo4j_client.execute_query("DROP INDEX entity_kb_name IF EXISTS")
+    await neo4j_client.ensure_schema()
+    records = await neo4j_client.execute_query(
+        "SHOW CONSTRAINTS YIELD name WHERE name = 'entity_kb_name_unique' RETURN name"
+    )
+    if records:
+        print("Entity (kb_id, name) uniqueness constraint is in place")
+    else:
+        print("Could not create the Entity (kb_id, name) uniqueness constraint; see the log")
+
+    await neo4j_client.close()
+    await engine.dispose()
+    print("Migration complete!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
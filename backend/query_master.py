@@ -1,4 +1,5 @@
 from app.core.fuseki import fuseki_client
+import asyncio
 import urllib.parse
 
 kb_id = "35c9a4e3-de46-4c0d-aeff-201518cf8532"
@@ -13,7 +14,7 @@ def print_comment_triples():
     }
     LIMIT 20
     """
-    results = fuseki_client.query_sparql(kb_id, query)
+    results = asyncio.run(fuseki_client.query_sparql(kb_id, query))
     for b in results.get("results", {}).get("bindings", []):
         s = b.get("s", {}).get("value", "?")
         o = b.get("o", {}).get("value", "?")
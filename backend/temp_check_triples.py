@@ -28,7 +28,7 @@ async def main():
     
     print(f"Querying KB: {kb_id}")
     try:
-        results = fuseki_client.query_sparql(kb_id, query)
+        results = await fuseki_client.query_sparql(kb_id, query)
         print(f"Found {len(results.get('results', {}).get('bindings', []))} triples:")
         for b in results.get('results', {}).get('bindings', []):
             p = b['p']['value']
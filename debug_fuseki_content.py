@@ -36,7 +36,7 @@ async def main():
     
     print(f"\nExecuting Debug Query against KB ID: {kb_id}...")
     try:
-        results = fuseki_client.query_sparql(kb_id, debug_query)
+        results = await fuseki_client.query_sparql(kb_id, debug_query)
         bindings = results.get("results", {}).get("bindings", [])
         
         print(f"\n[Debug Results] Found {len(bindings)} triples related to '성기훈':")
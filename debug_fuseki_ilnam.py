@@ -33,7 +33,7 @@ async def main():
     
     print(f"\nExecuting Debug Query against KB ID: {kb_id}...")
     try:
-        results = fuseki_client.query_sparql(kb_id, debug_query)
+        results = await fuseki_client.query_sparql(kb_id, debug_query)
         bindings = results.get("results", {}).get("bindings", [])
         
         print(f"\n[Debug Results] Found {len(bindings)} triples related to '일남':")
@@ -65,7 +65,7 @@ async def main():
         }
         LIMIT 50
         """
-        results_rel = fuseki_client.query_sparql(kb_id, rel_query)
+        results_rel = await fuseki_client.query_sparql(kb_id, rel_query)
         bindings_rel = results_rel.get("results", {}).get("bindings", [])
         print(f"Found {len(bindings_rel)} triples with '스승' or '제자' predicate:")
         for binding in bindings_rel:
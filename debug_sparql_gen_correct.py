@@ -98,7 +98,7 @@ async def main():
         full_query = sparql_query
         
     try:
-        results = fuseki_client.query_sparql(kb_id, full_query)
+        results = await fuseki_client.query_sparql(kb_id, full_query)
         bindings = results.get("results", {}).get("bindings", [])
         
         print(f"Found {len(bindings)} bindings.")
@@ -76,7 +76,7 @@ async def main():
     
     print(f"\nExecuting against KB ID: {kb_id}...")
     try:
-        results = fuseki_client.query_sparql(kb_id, full_query)
+        results = await fuseki_client.query_sparql(kb_id, full_query)
         bindings = results.get("results", {}).get("bindings", [])
         
         print(f"\n[Execution Results] Found {len(bindings)} bindings:")